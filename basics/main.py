@@ -12,15 +12,49 @@ Basics 脚本骨架：提供一个示例函数与 CLI 入口
 - 命令行：
     python basics/main.py --demo
     python basics/main.py "Hello  \nWorld" --collapse-crossline-only --preserve-case
+    python basics/main.py --bench
 
 参数与实现细节：
 - 正则模式详解见函数内注释：
   - r"\\s+": 折叠任意空白字符（空格、制表符、换行等）。
   - r"[ \t]*(?:\r?\n)+[ \t]*": 仅折叠跨行空白，且吞掉换行两侧的空格/制表符。
+- 批量处理使用 `normalize_texts`：按参数组合只选一次规范化函数，正则在模块加载时预编译。
+- 处理 socket/文件读到的原始字节时用 `normalize_bytes`，纯 ASCII 输入无需解码再编码；
+  结果须写进既有缓冲区时用 `normalize_bytes_into`。
+- 输入高度重复时可以用 `NormalizeCache` 包一层有界 LRU 缓存，并查看命中率。
 """
 
 import argparse
+import io
+import os
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import TextIO
+
+# 预编译的正则：避免每次调用 re.sub 时都去查一次模式缓存。
+_WHITESPACE_RE = re.compile(r"\s+")
+_CROSSLINE_RE = re.compile(r"[ \t]*(?:\r?\n)+[ \t]*")
+# 字节版（仅用于纯 ASCII 输入）：ASCII 范围内 str.isspace 为真的字符是
+# \t \n \v \f \r、\x1c-\x1f 与空格，比 bytes.split()/strip() 的默认集合多出 \x1c-\x1f。
+_ASCII_WHITESPACE = b"\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "
+_SEPARATORS = b"\x1c\x1d\x1e\x1f"
+_UPPER = bytes(range(ord("A"), ord("Z") + 1))
+_LOWER = bytes(range(ord("a"), ord("z") + 1))
+# bytes.translate 的转换表：把 \x1c-\x1f 换成空格，使 bytes.split() 的空白集合
+# 与 str.split() 一致；_FOLD_LOWER 同时把大写字母转小写，一次遍历完成两件事。
+_FOLD = bytes.maketrans(_SEPARATORS, b"    ")
+_FOLD_LOWER = bytes.maketrans(_SEPARATORS + _UPPER, b"    " + _LOWER)
+
+# 流式模式每次读取的字符数。
+DEFAULT_CHUNK_SIZE = 1 << 16
+# 多进程模式下每个分片包含的行数。
+DEFAULT_LINES_PER_CHUNK = 10_000
 
 
 def normalize_text(
@@ -58,11 +92,11 @@ def normalize_text(
             # - 非捕获组 (?:\r?\n)+ 匹配一个或多个换行（兼容 Windows 的 \r\n 与 *nix 的 \n）。
             # - 两侧 [ \t]* 匹配可选的空格/制表符，用于“吞掉”换行邻近的行尾/行首空白。
             # - 整体效果：把跨行边界及其两侧空白折叠为一个空格，保留行内多空格不动。
-            s = re.sub(r"[ \t]*(?:\r?\n)+[ \t]*", " ", s)
+            s = _CROSSLINE_RE.sub(" ", s)
         else:
             # 折叠任意空白字符（空格、制表符、换行等）为单个空格。
             # r"\\s+" 覆盖了大多数空白场景，适合做通用规范化。
-            s = re.sub(r"\s+", " ", s)
+            s = _WHITESPACE_RE.sub(" ", s)
 
     if not preserve_case:
         # 统一转为小写，减少大小写差异带来的比较/检索问题。
@@ -71,6 +105,542 @@ def normalize_text(
     return s
 
 
+def _collapse_all(s: str) -> str:
+    # str.split() 与 r"\s" 使用同一套空白字符定义（str.isspace），
+    # 无参 split 会同时去掉首尾空白并丢弃空片段，等价于 strip + re.sub(r"\s+", " ")，
+    # 但不经过正则引擎，对 ASCII 短串尤其便宜。
+    return " ".join(s.split())
+
+
+def _collapse_all_lower(s: str) -> str:
+    return " ".join(s.split()).lower()
+
+
+def _collapse_crossline(s: str) -> str:
+    s = s.strip()
+    # 没有换行时正则不会命中，直接跳过匹配。
+    if "\n" in s:
+        s = _CROSSLINE_RE.sub(" ", s)
+    return s
+
+
+def _collapse_crossline_lower(s: str) -> str:
+    return _collapse_crossline(s).lower()
+
+
+def _strip_only(s: str) -> str:
+    return s.strip()
+
+
+def _strip_lower(s: str) -> str:
+    return s.strip().lower()
+
+
+def select_normalizer(
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+) -> Callable[[str], str]:
+    """按参数组合返回一个单参数规范化函数，输出与 `normalize_text` 完全一致。
+
+    参数判断只在这里做一次，批量处理时每个字符串只需一次函数调用。
+    """
+    if collapse_spaces:
+        if collapse_crossline_only:
+            return _collapse_crossline if preserve_case else _collapse_crossline_lower
+        return _collapse_all if preserve_case else _collapse_all_lower
+    return _strip_only if preserve_case else _strip_lower
+
+
+def normalize_texts(
+    texts: Iterable[str],
+    *,
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+) -> list[str]:
+    """批量规范化：对每个字符串调用同一个预选的规范化函数，返回结果列表。
+
+    参数含义与 `normalize_text` 相同（仅限关键字传参）；输出逐项等于
+    `[normalize_text(s, ...) for s in texts]`。
+
+    示例：
+    - normalize_texts(["  A  b ", "C\\nD"]) -> ["a b", "c d"]
+    """
+    func = select_normalizer(preserve_case, collapse_spaces, collapse_crossline_only)
+    return list(map(func, texts))
+
+
+BytesLike = bytes | bytearray | memoryview
+
+
+def _collapse_crossline_bytes(data: bytes) -> bytes:
+    # 与 _CROSSLINE_RE 等价的字节版，按行切开后用 strip 处理，不经过正则引擎：
+    # 换行前的 [ \t]*\r? 与换行后的 [ \t]* 被吞掉；相邻换行之间为空（或只有一个
+    # 属于 \r\n 的 \r）的行属于同一段 (?:\r?\n)+，整段只换成一个空格。
+    lines = data.split(b"\n")
+    parts = [lines[0].removesuffix(b"\r").rstrip(b" \t")]
+    parts += [
+        line.removesuffix(b"\r").strip(b" \t")
+        for line in lines[1:-1]
+        if line and line != b"\r"
+    ]
+    parts.append(lines[-1].lstrip(b" \t"))
+    return b" ".join(parts)
+
+
+def normalize_bytes(
+    data: BytesLike,
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+) -> bytes:
+    """`normalize_text` 的 UTF-8 字节版，返回值等于
+    `normalize_text(data.decode("utf-8"), ...).encode("utf-8")`。
+
+    - 纯 ASCII 输入全程在字节上完成，不解码也不再编码：折叠全部空白时
+      `translate` 一次遍历完成小写与分隔符替换，再 `split`/`join`；仅折叠跨行
+      空白时按行 `strip` 后拼接，不经过正则。
+    - bytearray/memoryview 先复制为 bytes（与解码一样是一次复制），之后同上。
+    - 含非 ASCII 字节时解码为 str 走 `normalize_text` 再编码，保证 Unicode
+      空白与大小写规则完全一致；非法 UTF-8 抛出 UnicodeDecodeError。
+
+    示例：
+    - normalize_bytes(b"  Foo\r\nBar  ") -> b"foo bar"
+    """
+    if type(data) is not bytes:
+        data = bytes(data)
+
+    if not data.isascii():
+        text = data.decode("utf-8")
+        return normalize_text(
+            text, preserve_case, collapse_spaces, collapse_crossline_only
+        ).encode("utf-8")
+
+    if collapse_spaces and not collapse_crossline_only:
+        table = _FOLD if preserve_case else _FOLD_LOWER
+        return b" ".join(data.translate(table).split())
+
+    out = data.strip(_ASCII_WHITESPACE)
+    if collapse_spaces and b"\n" in out:
+        out = _collapse_crossline_bytes(out)
+    if not preserve_case:
+        out = out.lower()
+    return out
+
+
+def normalize_bytes_into(
+    data: BytesLike,
+    out: bytearray | memoryview,
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+) -> int:
+    """把 `normalize_bytes` 的结果写入调用方提供的缓冲区开头，返回写入的字节数。
+
+    结果先生成为 bytes 再复制进 `out`，比直接用 `normalize_bytes` 多一次复制；
+    只在输出必须落进既有缓冲区（预分配的发送缓冲、共享内存等）时使用。
+    纯 ASCII 输入的结果不会长于输入，`len(out) >= len(data)` 时总能写下；
+    非 ASCII 的小写可能变长（如 "İ" -> "i̇"）。缓冲区不够大时抛出 ValueError。
+    """
+    result = normalize_bytes(
+        data, preserve_case, collapse_spaces, collapse_crossline_only
+    )
+    n = len(result)
+    view = memoryview(out)
+    if view.format != "B":
+        view = view.cast("B")
+    if n > len(view):
+        raise ValueError(f"输出缓冲区太小：需要 {n} 字节，只有 {len(view)} 字节")
+    view[:n] = result
+    return n
+
+
+class NormalizeCache:
+    """`normalize_text` 的有界 LRU 缓存，适合标题、作者名、标签等高度重复的输入。
+
+    - 键为 (字符串, preserve_case, collapse_spaces, collapse_crossline_only)。
+    - 同时受条目数 `max_size` 与字节预算 `max_bytes` 约束（按 `sys.getsizeof`
+      估算键和值的字符串大小），超出时从最久未使用的条目开始淘汰。
+    - 单个结果就超出字节预算时只计算不缓存。
+    - 内部用一把锁保护字典与计数器，可以直接交给线程池使用，例如
+      `run_in_threads(cache, items)`；规范化本身在锁外执行。
+
+    示例：
+    >>> cache = NormalizeCache(max_size=2)
+    >>> cache("  Foo ")
+    'foo'
+    >>> cache("  Foo ")
+    'foo'
+    >>> cache.stats()["hits"]
+    1
+    """
+
+    def __init__(self, max_size: int = 100_000, max_bytes: int = 64 * 1024 * 1024):
+        if max_size <= 0 or max_bytes <= 0:
+            raise ValueError("max_size 与 max_bytes 必须为正整数")
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[tuple, tuple[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(
+        self,
+        s: str,
+        preserve_case: bool = False,
+        collapse_spaces: bool = True,
+        collapse_crossline_only: bool = False,
+    ) -> str:
+        """与 `normalize_text` 参数、返回值相同，命中时直接返回缓存结果。"""
+        key = (s, preserve_case, collapse_spaces, collapse_crossline_only)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        result = normalize_text(
+            s,
+            preserve_case=preserve_case,
+            collapse_spaces=collapse_spaces,
+            collapse_crossline_only=collapse_crossline_only,
+        )
+        size = sys.getsizeof(s) + sys.getsizeof(result)
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            # 其他线程可能已经写入了同一个键，先扣掉旧条目的大小。
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (result, size)
+            self._bytes += size
+            while len(self._data) > self.max_size or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return result
+
+    def stats(self) -> dict:
+        """返回命中/未命中/淘汰次数、命中率以及当前条目数与字节数。"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "bytes": self._bytes,
+            }
+
+    def clear(self) -> None:
+        """清空缓存条目与计数器。"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+def _fold_segment(
+    seg: str,
+    preserve_case: bool,
+    collapse_spaces: bool,
+    collapse_crossline_only: bool,
+) -> str:
+    """与 `normalize_text` 相同的折叠/小写规则，但不做 strip（用于流式分段）。"""
+    if collapse_spaces:
+        if collapse_crossline_only:
+            seg = _CROSSLINE_RE.sub(" ", seg)
+        else:
+            seg = _WHITESPACE_RE.sub(" ", seg)
+    if not preserve_case:
+        seg = seg.lower()
+    return seg
+
+
+def _tail_start(buf: str) -> int:
+    """返回 buf 末尾“最后一段空白 + 其后的未完结词”的起点，没有空白时返回 len(buf)。
+
+    只从右往左看：结尾是空白时由 `rstrip` 得到空白段起点；否则由
+    `rsplit(None, 1)` 定位最后一个词之前的空白段，扫描量只与末尾长度有关。
+    """
+    stripped = len(buf.rstrip())
+    if stripped < len(buf):
+        return stripped
+    parts = buf.rsplit(None, 1)
+    if len(parts) == 2:
+        return len(parts[0])
+    return 0 if buf[:1].isspace() else len(buf)
+
+
+def _iter_segments(chunks: Iterable[str], flush_limit: int) -> Iterator[str]:
+    """把任意切分的原始文本块重新切成可以各自独立折叠的分段。
+
+    - 每块末尾的“空白段 + 未完结的词”暂存，拼到下一块开头再处理，
+      因此跨块的空白（包括被切开的 \r\n）总是作为一个整体参与折叠。
+    - 开头的空白在遇到第一个非空白字符前全部丢弃，结尾暂存的空白在 EOF 时丢弃，
+      对应整体处理时的 `strip()`。
+    - 暂存内容超过 `flush_limit` 且仍停留在同一个词里时直接产出，保证内存有界。
+      这会把超长的词切开，词尾 Σ 的小写取决于后文（σ/ς），被切开后可能与
+      `normalize_text` 不同；不超过 `flush_limit` 的词不受影响。
+
+    产出的每个分段都以非空白字符结尾，交给 `_fold_segment` 后依次拼接，
+    就等于对整段文本调用 `normalize_text`。
+    """
+    pending = ""
+    started = False  # 是否已经产出过非空白内容（决定开头空白是否丢弃）
+    for chunk in chunks:
+        buf = pending + chunk
+        cut = _tail_start(buf)
+        if cut == 0 and len(buf) > flush_limit and not buf[-1].isspace():
+            cut = len(buf)
+        seg, pending = buf[:cut], buf[cut:]
+        if not started:
+            seg = seg.lstrip()
+            if not seg:
+                continue
+            started = True
+        yield seg
+
+    # EOF：暂存部分去掉结尾空白后产出（相当于整体 strip 的右半部分）。
+    seg = pending.rstrip()
+    if not started:
+        seg = seg.lstrip()
+    if seg:
+        yield seg
+
+
+def normalize_stream(
+    src: TextIO,
+    dst: TextIO,
+    *,
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """流式规范化：按固定大小分块读取 `src`，把结果写入 `dst`。
+
+    写出的内容等于 `normalize_text(src.read(), ...)`，但内存占用只与
+    `chunk_size` 和最长的单个空白段有关，与文件大小无关。
+    唯一的例外是长度超过 `chunk_size` 的词会被强制切开，其中希腊字母词尾 Σ
+    的小写可能与整体处理不同（见 `_iter_segments`）。
+    分块边界的处理见 `_iter_segments`：跨块的空白段与 \r\n 会作为整体折叠。
+
+    建议以 `newline=""` 打开文件，保留原始的 \r\n 交给规则处理。
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须为正整数")
+
+    flags = (preserve_case, collapse_spaces, collapse_crossline_only)
+    chunks = iter(lambda: src.read(chunk_size), "")
+    for seg in _iter_segments(chunks, chunk_size):
+        dst.write(_fold_segment(seg, *flags))
+
+
+def _iter_line_chunks(src: TextIO, lines_per_chunk: int) -> Iterator[str]:
+    """按行范围把输入切成块，每块约 `lines_per_chunk` 行，且总在行尾结束。
+
+    第一块逐行读取，用它估算平均行长；之后每块按字符数整段 `read`，再用
+    `readline` 补齐到行尾，不再为每一行创建字符串，父进程的切分开销很小。
+    """
+    lines = list(islice(src, lines_per_chunk))
+    if not lines:
+        return
+    first = "".join(lines)
+    yield first
+    size = max(1, len(first) // len(lines)) * lines_per_chunk
+    while buf := src.read(size):
+        yield buf + src.readline()
+
+
+def normalize_stream_parallel(
+    src: TextIO,
+    dst: TextIO,
+    *,
+    preserve_case: bool = False,
+    collapse_spaces: bool = True,
+    collapse_crossline_only: bool = False,
+    workers: int | None = None,
+    lines_per_chunk: int = DEFAULT_LINES_PER_CHUNK,
+) -> None:
+    """多进程流式规范化：按行范围分片，交给进程池并行处理，按原顺序写出。
+
+    结果与 `normalize_stream` / `normalize_text` 完全一致：
+    - 分片后的边界仍经 `_iter_segments` 调整，跨片的空白段整体留在下一片开头；
+      分片都以换行结尾，切点由 `_tail_start` 从右往左找到，只需扫描结尾的空白段，
+      父进程的串行部分远小于折叠本身；
+    - 每次提交给子进程的是一整片文本而不是单个字符串，减少进程间通信次数；
+    - 同时在途的分片最多 `2 * workers` 个，按提交顺序取回结果，内存占用有界。
+
+    参数：
+    - workers: 进程数，默认 `os.cpu_count()`。
+    - lines_per_chunk: 每片包含的行数；片越大 IPC 开销越小，但单片内存越高。
+    """
+    if lines_per_chunk <= 0:
+        raise ValueError("lines_per_chunk 必须为正整数")
+    workers = workers or os.cpu_count() or 1
+    flags = (preserve_case, collapse_spaces, collapse_crossline_only)
+    chunks = _iter_line_chunks(src, lines_per_chunk)
+    segments = _iter_segments(chunks, DEFAULT_CHUNK_SIZE)
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        in_flight: deque[Future] = deque()
+        for seg in segments:
+            in_flight.append(ex.submit(_fold_segment, seg, *flags))
+            if len(in_flight) >= 2 * workers:
+                dst.write(in_flight.popleft().result())
+        while in_flight:
+            dst.write(in_flight.popleft().result())
+
+
+# --demo 与 --bench 共用的参数组合：(标题, 关键字参数)
+DEMO_CONFIGS: list[tuple[str, dict]] = [
+    ("默认(小写+折叠空白)", {}),
+    ("保留大小写 + 折叠空白", {"preserve_case": True}),
+    ("保留大小写 + 不折叠空白", {"preserve_case": True, "collapse_spaces": False}),
+    (
+        "保留行内多空白 + 仅折叠跨行空白",
+        {"preserve_case": True, "collapse_crossline_only": True},
+    ),
+]
+
+DEMO_SAMPLES: list[str] = [
+    "  Hello   World\nPython  ",
+    "\tMix\ted   CASE   ",
+    "   ",
+    "Foo\nBar\tBaz",
+    "A\r\nB   C",
+]
+
+
+def run_benchmark(repeat: int = 200_000) -> None:
+    """吞吐量基准：对比逐条 `normalize_text` 与批量 `normalize_texts`。
+
+    输入为 DEMO_SAMPLES 重复 `repeat` 次，按 DEMO_CONFIGS 的四种参数组合分别计时，
+    输出每秒处理的字符串数量与加速比。
+    """
+    texts = DEMO_SAMPLES * repeat
+    print(f"== Bench: {len(texts):,} 条字符串 ==")
+    for title, flags in DEMO_CONFIGS:
+        start = time.perf_counter()
+        expected = [normalize_text(s, **flags) for s in texts]
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = normalize_texts(texts, **flags)
+        batch = time.perf_counter() - start
+
+        assert got == expected, f"normalize_texts 输出与 normalize_text 不一致: {title}"
+        print(
+            f"{title}: normalize_text {len(texts) / single:,.0f}/s, "
+            f"normalize_texts {len(texts) / batch:,.0f}/s, "
+            f"x{single / batch:.2f}"
+        )
+
+
+def run_bytes_benchmark(repeat: int = 200_000) -> None:
+    """字节基准：对比 decode + `normalize_text` + encode 与 `normalize_bytes`。
+
+    输入为 DEMO_SAMPLES 编码后重复 `repeat` 次，bytes 与 memoryview 两种输入
+    分别计时，输出每秒处理的条数与加速比。
+    """
+    raw = [s.encode("utf-8") for s in DEMO_SAMPLES] * repeat
+    views = [memoryview(b) for b in raw]
+    print(f"== Bench: {len(raw):,} 条字节串 ==")
+    for title, flags in DEMO_CONFIGS:
+        for kind, items in (("bytes", raw), ("memoryview", views)):
+            start = time.perf_counter()
+            expected = [
+                normalize_text(str(b, "utf-8"), **flags).encode("utf-8")
+                for b in items
+            ]
+            round_trip = time.perf_counter() - start
+
+            start = time.perf_counter()
+            got = [normalize_bytes(b, **flags) for b in items]
+            direct = time.perf_counter() - start
+
+            assert got == expected, f"normalize_bytes 输出不一致: {title}"
+            print(
+                f"{title} [{kind}]: decode/encode {len(items) / round_trip:,.0f}/s, "
+                f"normalize_bytes {len(items) / direct:,.0f}/s, "
+                f"x{round_trip / direct:.2f}"
+            )
+
+
+def run_parallel_benchmark(workers: int, lines: int = 2_000_000) -> None:
+    """多进程扩展性基准：同一份语料分别用 1..workers 个进程处理并计时。
+
+    语料由 DEMO_SAMPLES 拼接成 `lines` 行，使用“仅折叠跨行空白”组合（正则最重）。
+    """
+    flags = {"collapse_crossline_only": True}
+    corpus = "".join(s + "\r\n" for s in DEMO_SAMPLES) * (lines // len(DEMO_SAMPLES))
+    print(f"== Bench: 多进程, {corpus.count(chr(10)):,} 行 ==")
+
+    start = time.perf_counter()
+    expected = io.StringIO()
+    normalize_stream(io.StringIO(corpus, newline=""), expected, **flags)
+    serial = time.perf_counter() - start
+    print(f"normalize_stream: {serial:.2f}s")
+
+    # 父进程串行部分（读取 + 分片），决定多进程加速比的上限。
+    start = time.perf_counter()
+    src = io.StringIO(corpus, newline="")
+    chunks = _iter_line_chunks(src, DEFAULT_LINES_PER_CHUNK)
+    for _ in _iter_segments(chunks, DEFAULT_CHUNK_SIZE):
+        pass
+    split = time.perf_counter() - start
+    print(f"父进程分片: {split:.2f}s（加速比上限约 x{serial / split:.0f}）")
+
+    counts = sorted({1 << i for i in range(workers.bit_length())} | {workers})
+    for n in counts:
+        start = time.perf_counter()
+        out = io.StringIO()
+        normalize_stream_parallel(
+            io.StringIO(corpus, newline=""), out, workers=n, **flags
+        )
+        elapsed = time.perf_counter() - start
+        assert out.getvalue() == expected.getvalue(), "多进程输出与串行不一致"
+        print(f"workers={n}: {elapsed:.2f}s, x{serial / elapsed:.2f}")
+
+
+def _run_stream(
+    src: TextIO, dst: TextIO, args: argparse.Namespace, flags: dict
+) -> None:
+    """按 --workers 选择串行流式或多进程流式处理。"""
+    if args.workers > 1:
+        normalize_stream_parallel(src, dst, workers=args.workers, **flags)
+    else:
+        normalize_stream(src, dst, chunk_size=args.chunk_size, **flags)
+
+
+def print_int_literals() -> None:
+    """--demo 的附加演示：不同进制的整数字面量。
+
+    只在 --demo 时打印；流式模式的标准输出只包含规范化结果。
+    """
+    # python中的变量和数据类型
+    # 变量：用于存储数据的容器，每个变量都有一个唯一的名称（标识符）。
+    # 数据类型：变量可以存储不同类型的数据，如整数、浮点数、字符串等。
+    # 整数（int）： whole numbers without a decimal point.
+    print(f"二进制整数0b100 = {0b100}")  # 二进制整数
+    print(f"0o100 = {0o100}")  # 八进制整数
+    print(f"100 = {100}")  # 十进制整数
+    print(f"0x100 = {0x100}")  # 十六进制整数
+    # 浮点数（float）： numbers with a decimal point.
+    # 字符串（str）： sequences of characters enclosed in single or double quotes.
+    # 布尔值（bool）： True or False.
+
+
 def main() -> None:
     """命令行入口：解析参数并调用 `normalize_text`。
 
@@ -80,10 +650,18 @@ def main() -> None:
     - --no-collapse-spaces：不折叠连续空白（保留原始空白结构）。
     - --collapse-crossline-only：仅折叠跨行空白，保留行内多空白（需与折叠开关配合）。
     - --demo：展示一组示例的规范化输出，便于理解各参数效果。
+    - --input / --output：流式处理文件（分块读写，内存占用与文件大小无关）；
+      省略 --output 时写到标准输出。
+    - --workers N：流式模式下用 N 个进程按行范围分片并行处理；与 --bench 同用时
+      额外测量多进程扩展性。
+    - --bench / --bench-repeat：按 --demo 的参数组合测量逐条与批量规范化、
+      以及字节版与解码/编码往返的吞吐量。
 
     典型用法：
     - python basics/main.py "Hello   World"  # 默认：折叠空白+转小写
     - python basics/main.py --demo            # 查看参数组合的行为差异
+    - python basics/main.py --bench           # 吞吐量基准
+    - python basics/main.py --input in.log --output out.log --collapse-crossline-only
     """
     parser = argparse.ArgumentParser(description="Basics demo")
 
@@ -110,62 +688,72 @@ def main() -> None:
     # 演示模式：打印多组规范化结果，帮助直观对比参数效果。
     parser.add_argument("--demo", action="store_true", help="展示规范化示例输出")
 
+    # 流式文件模式：按块读写，适合无法一次读入内存的大文件。
+    parser.add_argument("--input", metavar="PATH", help="流式规范化的输入文件")
+    parser.add_argument(
+        "--output", metavar="PATH", help="流式模式的输出文件，默认写到标准输出"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"流式模式每次读取的字符数（默认 {DEFAULT_CHUNK_SIZE}）",
+    )
+
+    # 多进程模式：按行范围分片并行处理 --input 指定的文件。
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="流式模式/基准使用的进程数，大于 1 时启用多进程（默认 1）",
+    )
+
+    # 基准模式：按 --demo 的四种参数组合测量吞吐量。
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="对比 normalize_text/normalize_texts/normalize_bytes 吞吐量",
+    )
+    parser.add_argument(
+        "--bench-repeat",
+        type=int,
+        default=200_000,
+        help="基准输入为示例重复的次数（默认 200000）",
+    )
+
     args = parser.parse_args()
+    flags = {
+        "preserve_case": args.preserve_case,
+        "collapse_spaces": not args.no_collapse_spaces,
+        "collapse_crossline_only": args.collapse_crossline_only,
+    }
 
     if args.demo:
         # 一组包含不同空白与大小写的示例，便于展示各参数组合的行为差异。
-        samples = [
-            "  Hello   World\nPython  ",
-            "\tMix\ted   CASE   ",
-            "   ",
-            "Foo\nBar\tBaz",
-            "A\r\nB   C",
-        ]
-
-        print("== Demo: 默认(小写+折叠空白) ==")
-        for s in samples:
-            print(repr(s), "=>", normalize_text(s))
-
-        print("\n== Demo: 保留大小写 + 折叠空白 ==")
-        for s in samples:
-            print(repr(s), "=>", normalize_text(s, preserve_case=True))
-
-        print("\n== Demo: 保留大小写 + 不折叠空白 ==")
-        for s in samples:
-            print(
-                repr(s),
-                "=>",
-                normalize_text(s, preserve_case=True, collapse_spaces=False),
-            )
-
-        print("\n== Demo: 保留行内多空白 + 仅折叠跨行空白 ==")
-        for s in samples:
-            print(
-                repr(s),
-                "=>",
-                normalize_text(s, preserve_case=True, collapse_crossline_only=True),
-            )
+        for i, (title, flags) in enumerate(DEMO_CONFIGS):
+            print(("\n" if i else "") + f"== Demo: {title} ==")
+            for s in DEMO_SAMPLES:
+                print(repr(s), "=>", normalize_text(s, **flags))
+        print("\n== Demo: 整数字面量 ==")
+        print_int_literals()
+    elif args.bench:
+        # 基准模式：对比逐条调用与批量 API 的吞吐量。
+        run_benchmark(args.bench_repeat)
+        run_bytes_benchmark(args.bench_repeat)
+        if args.workers > 1:
+            run_parallel_benchmark(args.workers)
+    elif args.input:
+        # 流式模式：newline="" 保留原始换行，交给折叠规则统一处理。
+        with open(args.input, encoding="utf-8", newline="") as src:
+            if args.output:
+                with open(args.output, "w", encoding="utf-8", newline="") as dst:
+                    _run_stream(src, dst, args, flags)
+            else:
+                _run_stream(src, sys.stdout, args, flags)
     else:
         # 正常模式：根据命令行参数调用规范化函数并输出结果。
-        result = normalize_text(
-            args.text,
-            preserve_case=args.preserve_case,
-            collapse_spaces=(not args.no_collapse_spaces),
-            collapse_crossline_only=args.collapse_crossline_only,
-        )
-        print(result)
-
-# python中的变量和数据类型
-# 变量：用于存储数据的容器，每个变量都有一个唯一的名称（标识符）。
-# 数据类型：变量可以存储不同类型的数据，如整数、浮点数、字符串等。
-# 整数（int）： whole numbers without a decimal point.
-print(f"二进制整数0b100 = {0b100}")  # 二进制整数
-print(f"0o100 = {0o100}")  # 八进制整数
-print(f"100 = {100}")    # 十进制整数
-print(f"0x100 = {0x100}")  # 十六进制整数
-# 浮点数（float）： numbers with a decimal point.
-# 字符串（str）： sequences of characters enclosed in single or double quotes.
-# 布尔值（bool）： True or False.
+        print(normalize_text(args.text, **flags))
+
 
 if __name__ == "__main__":
     # 作为脚本运行时进入命令行逻辑；被其他模块导入时不会执行。
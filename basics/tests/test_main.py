@@ -1,4 +1,24 @@
-from basics.main import normalize_text
+import io
+import itertools
+import random
+import re
+import sys
+
+import pytest
+
+from basics.main import (
+    NormalizeCache,
+    _iter_line_chunks,
+    _tail_start,
+    main,
+    normalize_bytes,
+    normalize_bytes_into,
+    normalize_stream,
+    normalize_stream_parallel,
+    normalize_text,
+    normalize_texts,
+)
+from concurrency.main import run_in_threads
 
 
 def test_normalize_text_basic():
@@ -54,3 +74,216 @@ def test_crossline_only_windows_crlf():
     # Windows CRLF 行结尾的跨行折叠
     assert normalize_text("A\r\nB   C") == "a b c"
     assert normalize_text("A\r\nB   C", collapse_crossline_only=True) == "a b   c"
+
+
+def test_normalize_texts_matches_normalize_text():
+    # 批量 API 在各参数组合下逐项等于 normalize_text（含非 ASCII 空白）
+    samples = [
+        "  Hello   World\nPython  ",
+        "\tMix\ted   CASE   ",
+        "   ",
+        "",
+        "A\r\nB   C",
+        "a\n \nb",
+        "Ünïcode　Space\xa0NBSP\x1cSEP ",
+        "行首 \r\n\r\n  行尾",
+    ]
+    for preserve_case in (False, True):
+        for collapse_spaces in (False, True):
+            for crossline in (False, True):
+                flags = {
+                    "preserve_case": preserve_case,
+                    "collapse_spaces": collapse_spaces,
+                    "collapse_crossline_only": crossline,
+                }
+                expected = [normalize_text(s, **flags) for s in samples]
+                assert normalize_texts(samples, **flags) == expected
+
+
+def test_normalize_texts_accepts_generator():
+    assert normalize_texts(s for s in ["  A ", "B\nC"]) == ["a", "b c"]
+
+
+def test_normalize_stream_matches_normalize_text_across_chunks():
+    # 小块读取时，跨块边界的 \r\n 与空白段仍按整体折叠
+    samples = [
+        "  Hello   World\nPython  ",
+        "A\r\nB   C",
+        "行首 \t\r\n\r\n  行尾\r\n",
+        "x \n \ny\t\tz  \r\n",
+        "   ",
+    ]
+    for text in samples:
+        for crossline in (False, True):
+            for preserve_case in (False, True):
+                flags = {
+                    "preserve_case": preserve_case,
+                    "collapse_crossline_only": crossline,
+                }
+                for chunk_size in (1, 2, 3, 5, 64):
+                    out = io.StringIO()
+                    normalize_stream(
+                        io.StringIO(text, newline=""),
+                        out,
+                        chunk_size=chunk_size,
+                        **flags,
+                    )
+                    assert out.getvalue() == normalize_text(text, **flags)
+
+
+def test_normalize_stream_keeps_words_whole_for_lower():
+    # 词不超过块大小时不会被切开，希腊字母词尾 Σ 的小写与整体处理一致
+    text = "ΟΔΟΣ ΑΣ\nΣΑ  "
+    out = io.StringIO()
+    normalize_stream(io.StringIO(text), out, chunk_size=5)
+    assert out.getvalue() == normalize_text(text) == "οδος ας σα"
+
+
+def test_tail_start_finds_last_whitespace_run():
+    # 与正则 \s+\S*\Z 的匹配起点一致，但只从右往左扫描
+    trailing = re.compile(r"\s+\S*\Z")
+    for chars in itertools.product(["a", " ", "\n", "\u3000", "Σ"], repeat=5):
+        for n in range(6):
+            buf = "".join(chars[:n])
+            m = trailing.search(buf)
+            assert _tail_start(buf) == (m.start() if m else len(buf)), repr(buf)
+
+
+def test_main_streams_input_to_output(tmp_path, monkeypatch):
+    src = tmp_path / "in.txt"
+    dst = tmp_path / "out.txt"
+    src.write_bytes(b"  Foo  \r\n  Bar\tBaz \r\n")
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "main.py",
+            "--input",
+            str(src),
+            "--output",
+            str(dst),
+            "--collapse-crossline-only",
+            "--chunk-size",
+            "4",
+        ],
+    )
+    main()
+    assert dst.read_text(encoding="utf-8") == "foo bar\tbaz"
+
+
+def test_main_stdout_carries_only_stream_output(tmp_path, capsys, monkeypatch):
+    # 省略 --output 时标准输出只有规范化结果，导入模块也不会打印任何内容
+    src = tmp_path / "in.txt"
+    src.write_bytes(b"  Foo \n Bar ")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--input", str(src)])
+    main()
+    assert capsys.readouterr().out == "foo bar"
+
+
+def test_normalize_stream_parallel_matches_serial():
+    # 按行分片并行处理，输出顺序与内容和整体处理一致
+    text = "  Head\r\n" + "Foo \t\r\n\r\n  Bar   BAZ\n\n" * 50 + "  tail  \r\n"
+    for flags in ({}, {"collapse_crossline_only": True}, {"collapse_spaces": False}):
+        out = io.StringIO()
+        normalize_stream_parallel(
+            io.StringIO(text, newline=""),
+            out,
+            workers=2,
+            lines_per_chunk=3,
+            **flags,
+        )
+        assert out.getvalue() == normalize_text(text, **flags)
+
+
+def test_iter_line_chunks_ends_shards_at_line_breaks():
+    text = "".join(f"{'x' * (i % 7)}\r\n" for i in range(100)) + "last"
+    chunks = list(_iter_line_chunks(io.StringIO(text, newline=""), 8))
+    assert "".join(chunks) == text
+    assert all(c.endswith("\n") for c in chunks[:-1])
+    assert len(chunks) > 5
+    assert list(_iter_line_chunks(io.StringIO(""), 8)) == []
+
+
+def test_normalize_cache_hits_and_flags_in_key():
+    cache = NormalizeCache(max_size=10)
+    assert cache("  Foo ") == "foo"
+    assert cache("  Foo ") == "foo"
+    assert cache("  Foo ", preserve_case=True) == "Foo"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+    assert stats["hit_rate"] == 1 / 3
+
+
+def test_normalize_cache_lru_eviction_by_size_and_bytes():
+    cache = NormalizeCache(max_size=2)
+    cache("a")
+    cache("b")
+    cache("a")  # a 变为最近使用
+    cache("c")  # 淘汰 b
+    assert cache.stats()["evictions"] == 1
+    cache("a")
+    assert cache.stats()["hits"] == 2
+
+    small = NormalizeCache(max_bytes=200)
+    small("x" * 10)
+    small("y" * 10)
+    assert small.stats()["bytes"] <= 200
+    assert small.stats()["evictions"] >= 1
+    small("z" * 1000)  # 超出预算的单个结果不缓存
+    assert small.stats()["size"] <= 1
+
+
+def test_normalize_cache_thread_safe_with_run_in_threads():
+    cache = NormalizeCache(max_size=3)
+    items = ["  A ", "B\nC", " d "] * 200
+    out = run_in_threads(cache, items, max_workers=4)
+    assert sorted(out) == sorted(normalize_text(s) for s in items)
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == len(items)
+    assert stats["size"] == 3
+
+
+def test_normalize_bytes_matches_normalize_text():
+    # bytes/bytearray/memoryview 三种输入，ASCII 与非 ASCII 都与 str 版一致
+    samples = [
+        "  Hello   World\nPython  ",
+        "A\r\nB   C",
+        "\x1cSep\x1fA \x0b\x0c",
+        "x \n \ny\t\tz  \r\n",
+        "   ",
+        "Ünïcode　Space\xa0NBSP  ",
+        "行首 \r\n  行尾",
+        "a\n\r\n \r \n\tb\r\r\nc",
+        "a\r \nB\n\n  \n C",
+    ]
+    for text in samples:
+        raw = text.encode("utf-8")
+        for flags in (
+            {},
+            {"preserve_case": True},
+            {"collapse_spaces": False},
+            {"collapse_crossline_only": True},
+        ):
+            expected = normalize_text(text, **flags).encode("utf-8")
+            for data in (raw, bytearray(raw), memoryview(raw)):
+                assert normalize_bytes(data, **flags) == expected
+
+
+def test_normalize_bytes_crossline_matches_regex():
+    # 按行 strip 的跨行折叠与正则逐字节一致（小字母表上的随机输入）
+    rnd = random.Random(0)
+    for _ in range(5000):
+        text = "".join(rnd.choice("ab \t\r\n") for _ in range(rnd.randrange(12)))
+        for flags in ({"collapse_crossline_only": True}, {"preserve_case": True}):
+            expected = normalize_text(text, **flags).encode()
+            assert normalize_bytes(text.encode(), **flags) == expected
+
+
+def test_normalize_bytes_into_reuses_buffer():
+    buf = bytearray(32)
+    n = normalize_bytes_into(b"  Foo\r\n  BAR ", buf)
+    assert bytes(buf[:n]) == b"foo bar"
+    n = normalize_bytes_into(memoryview(b" x "), memoryview(buf))
+    assert bytes(buf[:n]) == b"x"
+    with pytest.raises(ValueError):
+        normalize_bytes_into(b"abcdef", bytearray(3))
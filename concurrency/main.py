@@ -1,5 +1,13 @@
-from collections.abc import Callable, Iterable
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from itertools import islice
 
 
 def run_in_threads(func: Callable, items: Iterable, max_workers: int = 4) -> list:
@@ -11,5 +19,59 @@ def run_in_threads(func: Callable, items: Iterable, max_workers: int = 4) -> lis
     return results
 
 
+def imap_threads(
+    func: Callable,
+    items: Iterable,
+    max_workers: int = 4,
+    max_in_flight: int | None = None,
+    ordered: bool = True,
+) -> Iterator:
+    """`run_in_threads` 的流式版本：边读输入边提交，逐个产出结果。
+
+    - 同时在途（已提交未取走）的 future 最多 `max_in_flight` 个（默认
+      `2 * max_workers`），输入只在有空位时才继续读取，因此无论输入多长、
+      是否无限，内存占用都是有界的；
+    - 默认按输入顺序产出；`ordered=False` 时按完成顺序产出，慢元素不会
+      挡住后面已完成的结果；
+    - func 抛出的异常在取到对应结果时重新抛出；提前停止迭代时取消尚未开始的任务。
+
+    示例：
+    >>> list(imap_threads(lambda x: x * x, range(5), max_workers=2))
+    [0, 1, 4, 9, 16]
+    """
+    if max_workers <= 0:
+        raise ValueError("max_workers 必须为正整数")
+    if max_in_flight is None:
+        max_in_flight = 2 * max_workers
+    if max_in_flight <= 0:
+        raise ValueError("max_in_flight 必须为正整数")
+
+    it = iter(items)
+    ex = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        if ordered:
+            in_flight: deque[Future] = deque(
+                ex.submit(func, x) for x in islice(it, max_in_flight)
+            )
+            while in_flight:
+                # 先取走结果再补提交，在途的 future 始终不超过 max_in_flight 个。
+                result = in_flight[0].result()
+                in_flight.popleft()
+                yield result
+                for x in islice(it, 1):
+                    in_flight.append(ex.submit(func, x))
+        else:
+            pending = {ex.submit(func, x) for x in islice(it, max_in_flight)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+                    for x in islice(it, 1):
+                        pending.add(ex.submit(func, x))
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+
 if __name__ == "__main__":
     print(run_in_threads(lambda x: x * x, range(5)))
+    print(list(imap_threads(lambda x: x * x, range(5))))
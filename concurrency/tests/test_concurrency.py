@@ -1,6 +1,71 @@
-from concurrency.main import run_in_threads
+import itertools
+import threading
+import time
+
+import pytest
+
+from concurrency.main import imap_threads, run_in_threads
 
 
 def test_run_in_threads_basic():
     out = run_in_threads(lambda x: x + 1, [1, 2, 3], max_workers=2)
     assert sorted(out) == [2, 3, 4]
+
+
+def test_imap_threads_ordered_and_unordered():
+    def slow_first(x):
+        time.sleep(0.05 if x == 0 else 0.001)
+        return x * 10
+
+    assert list(imap_threads(slow_first, range(8), max_workers=4)) == [
+        x * 10 for x in range(8)
+    ]
+    out = list(imap_threads(slow_first, range(8), max_workers=4, ordered=False))
+    assert sorted(out) == [x * 10 for x in range(8)]
+    assert out[0] != 0  # 慢元素不挡住其它结果
+    assert list(imap_threads(abs, [])) == []
+
+
+def test_imap_threads_bounded_in_flight():
+    read = taken = peak = 0
+    lock = threading.Lock()
+
+    def source():
+        nonlocal read, peak
+        for i in itertools.count():
+            with lock:
+                read += 1
+                peak = max(peak, read - taken)  # 已读入但尚未交给调用方的个数
+            yield i
+
+    for ordered in (True, False):
+        read = taken = peak = 0
+        it = imap_threads(
+            lambda x: x, source(), max_workers=2, max_in_flight=3, ordered=ordered
+        )
+        got = []
+        for x in itertools.islice(it, 5):
+            with lock:
+                taken += 1
+            got.append(x)
+        if ordered:
+            assert got == list(range(5))
+        else:
+            assert len(set(got)) == 5
+        assert peak <= 3
+        assert read <= 5 + 3  # 至多多读 max_in_flight 个
+        it.close()
+
+
+def test_imap_threads_errors():
+    def boom(x):
+        if x == 3:
+            raise KeyError(x)
+        return x
+
+    it = imap_threads(boom, range(10), max_workers=2)
+    assert [next(it) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(KeyError):
+        next(it)
+    with pytest.raises(ValueError):
+        list(imap_threads(abs, [1], max_in_flight=0))
@@ -0,0 +1,436 @@
+"""ds_algo 查找基准：对比逐个 `binary_search` 与批量 `search_many` 的各实现。
+
+运行（在仓库根目录）：
+    python -m ds_algo.bench
+    python -m ds_algo.bench --sizes 1000 1000000 100000000 --queries 100000
+    python -m ds_algo.bench --index-sizes 1000 1000000
+    python -m ds_algo.bench --mixed-size 1000000 --write-ratios 0.1 0.5 0.9
+    python -m ds_algo.bench --learned-size 1000000
+
+回归套件（--suite）：在多种规模、键分布与命中率组合上测量每种查找实现的单次查询
+耗时，与 JSON 基线（默认 ds_algo/bench_baseline.json）比较，任何一项比基线慢
+超过阈值即以退出码 1 结束：
+    python -m ds_algo.bench --suite                   # 与默认基线比较
+    python -m ds_algo.bench --suite --update-baseline # 重新记录基线
+    python -m ds_algo.bench --suite --threshold 0.1 --baseline other.json
+
+基线与机器相关，换机器或 Python 版本后应先重新记录。
+
+有序数组用 `range(0, 2n, 2)` 表示（偶数命中、奇数未命中），不占用 O(n) 内存，
+因此 1e8 规模也能直接测；NumPy 实现会额外构造一份 `np.arange`，不超过
+`LIST_MAX_SIZE` 时还会构造一份 list 测量 list 输入下的 "auto"。
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from bisect import bisect_left, insort
+from collections.abc import Callable
+from pathlib import Path
+
+from ds_algo.main import (
+    BlockedSortedList,
+    LearnedIndex,
+    SortedIndex,
+    binary_search,
+    exponential_search,
+    interpolation_search,
+    np,
+    search_many,
+)
+
+# bench_search_many 额外测 list 输入的规模上限（1e8 个 int 的 list 约占 3.5 GiB）。
+LIST_MAX_SIZE = 10**7
+
+
+def _timeit(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_search_many(size: int, queries: int, seed: int = 0) -> dict[str, float]:
+    """返回各实现处理 `queries` 个目标所用的秒数。"""
+    rng = random.Random(seed)
+    arr = range(0, 2 * size, 2)
+    targets = [rng.randrange(2 * size) for _ in range(queries)]
+    sorted_targets = sorted(targets)
+
+    results = {
+        "binary_search": _timeit(lambda: [binary_search(arr, t) for t in targets]),
+        "bisect": _timeit(lambda: search_many(arr, targets, method="bisect")),
+        "merge(sorted)": _timeit(
+            lambda: search_many(arr, sorted_targets, method="merge")
+        ),
+    }
+    if np is not None:
+        np_arr = np.arange(0, 2 * size, 2, dtype=np.int64)
+        np_targets = np.asarray(targets, dtype=np.int64)
+        results["numpy"] = _timeit(
+            lambda: search_many(np_arr, np_targets, method="numpy")
+        )
+    if size <= LIST_MAX_SIZE:
+        # list 输入（仓库的常规约定）：一次查完全部目标，以及每次只查一个目标
+        # 的 "auto"——后者不应为每次调用复制整个数组。
+        keys = list(arr)
+        results["auto(list)"] = _timeit(lambda: search_many(keys, targets))
+        results["auto(list,1/call)"] = _timeit(
+            lambda: [search_many(keys, [t]) for t in targets]
+        )
+    return results
+
+
+def _list_nbytes(arr: list[int]) -> int:
+    # 列表本身（指针数组）加上每个 int 对象的大小。
+    return sys.getsizeof(arr) + sum(sys.getsizeof(x) for x in arr)
+
+
+def bench_sorted_index(size: int, queries: int, seed: int = 0) -> dict:
+    """对比 list + binary_search / bisect 与 SortedIndex 的内存占用和单次查找延迟。
+
+    返回 {"memory": {名称: 字节数}, "latency_ns": {名称: 每次查找纳秒}}。
+    """
+    rng = random.Random(seed)
+    arr = list(range(0, 2 * size, 2))
+    idx = SortedIndex(arr)
+    targets = [rng.randrange(2 * size) for _ in range(queries)]
+
+    def per_query(func: Callable[[int], object]) -> float:
+        return _timeit(lambda: [func(t) for t in targets]) / queries * 1e9
+
+    latency = {
+        "binary_search": per_query(lambda t: binary_search(arr, t)),
+        "bisect": per_query(lambda t: bisect_left(arr, t)),
+        "SortedIndex.find": per_query(idx.find),
+    }
+    if np is not None:
+        # 批量版本按层同步下降，按平均每个目标折算。
+        batch = _timeit(lambda: idx.search_many(targets))
+        latency["SortedIndex.search_many"] = batch / queries * 1e9
+    return {
+        "memory": {"list[int]": _list_nbytes(arr), "SortedIndex": idx.nbytes},
+        "latency_ns": latency,
+    }
+
+
+def bench_mixed_workload(
+    size: int, ops: int, write_ratio: float, seed: int = 0
+) -> dict[str, float]:
+    """读写混合负载：写操作一半插入、一半删除，读操作为 index_of 查找。
+
+    对照组是 list + insort / list.remove + binary_search，每次写都要搬移
+    插入点之后的全部元素；返回两者处理 `ops` 次操作的秒数。
+    """
+    rng = random.Random(seed)
+    base = list(range(0, 2 * size, 2))
+    plan = []
+    for _ in range(ops):
+        kind = "r"
+        if rng.random() < write_ratio:
+            kind = "a" if rng.random() < 0.5 else "d"
+        plan.append((kind, rng.randrange(2 * size)))
+
+    def run_list() -> None:
+        arr = list(base)
+        for kind, v in plan:
+            if kind == "a":
+                insort(arr, v)
+            elif kind == "d":
+                i = bisect_left(arr, v)
+                if i < len(arr):
+                    del arr[i]
+            else:
+                binary_search(arr, v)
+
+    def run_blocked() -> None:
+        s = BlockedSortedList(base)
+        for kind, v in plan:
+            if kind == "a":
+                s.add(v)
+            elif kind == "d":
+                i = s.lower_bound(v)
+                if i < len(s):
+                    s.remove(s[i])
+            else:
+                s.index_of(v)
+
+    return {
+        "list+insort": _timeit(run_list),
+        "BlockedSortedList": _timeit(run_blocked),
+    }
+
+
+class _CountingList(list):
+    """统计下标读取次数的列表，用于比较各查找算法的探测次数。"""
+
+    probes = 0
+
+    def __getitem__(self, i):
+        self.probes += 1
+        return super().__getitem__(i)
+
+
+def bench_learned_index(size: int, queries: int, seed: int = 0) -> dict:
+    """近似均匀分布的有序键上，对比各查找方式的平均探测次数与单次延迟。
+
+    返回 {"probes": {名称: 每次查询探测数}, "latency_ns": {...}, "segments": 段数}。
+    """
+    rng = random.Random(seed)
+    keys = sorted(rng.sample(range(size * 16), size))
+    # 一半命中、一半未命中
+    targets = [
+        keys[rng.randrange(size)] if i % 2 else rng.randrange(size * 16)
+        for i in range(queries)
+    ]
+    idx = LearnedIndex(keys)
+
+    searches: dict[str, Callable[[list[int], int], int]] = {
+        "binary_search": binary_search,
+        "interpolation_search": interpolation_search,
+        "exponential_search": exponential_search,
+        "LearnedIndex.find": lambda arr, t: idx.find(t),
+    }
+    latency = {
+        name: _timeit(lambda f=f: [f(keys, t) for t in targets]) / queries * 1e9
+        for name, f in searches.items()
+    }
+
+    counting = _CountingList(keys)
+    counting_idx = LearnedIndex(counting)
+    searches["LearnedIndex.find"] = lambda arr, t: counting_idx.find(t)
+    probes = {}
+    for name, f in searches.items():
+        counting.probes = 0
+        for t in targets:
+            f(counting, t)
+        probes[name] = counting.probes / queries
+    return {"probes": probes, "latency_ns": latency, "segments": idx.segments}
+
+
+DEFAULT_BASELINE = Path(__file__).with_name("bench_baseline.json")
+SUITE_DISTRIBUTIONS = ("dense", "uniform", "skewed")
+SUITE_HIT_RATIOS = (0.0, 0.5, 1.0)
+
+
+def _make_keys(distribution: str, size: int, rng: random.Random) -> list[int]:
+    """生成 `size` 个互不相同的有序键。"""
+    if distribution == "dense":
+        return list(range(size))
+    if distribution == "uniform":
+        return sorted(rng.sample(range(size * 16), size))
+    if distribution == "skewed":
+        # 帕累托分布的间隔：大部分键挤在一起，偶尔出现很大的跳跃。
+        keys, v = [], 0
+        for _ in range(size):
+            v += 1 + int(rng.paretovariate(1.2))
+            keys.append(v)
+        return keys
+    raise ValueError(f"未知的分布: {distribution!r}")
+
+
+def _make_targets(
+    keys: list[int], queries: int, hit_ratio: float, rng: random.Random
+) -> list[int]:
+    key_set = set(keys)
+    top = keys[-1] + len(keys) if keys else 1
+    targets = []
+    for _ in range(queries):
+        if keys and rng.random() < hit_ratio:
+            targets.append(keys[rng.randrange(len(keys))])
+            continue
+        while (v := rng.randrange(-1, top)) in key_set:
+            pass
+        targets.append(v)
+    return targets
+
+
+def suite_implementations(keys: list[int]) -> dict[str, Callable[[list[int]], object]]:
+    """为一份有序键构造各查找实现的批量调用函数（索引在计时之外建好）。"""
+    sorted_index = SortedIndex(keys)
+    learned = LearnedIndex(keys)
+    impls: dict[str, Callable[[list[int]], object]] = {
+        "binary_search": lambda ts: [binary_search(keys, t) for t in ts],
+        "interpolation_search": lambda ts: [interpolation_search(keys, t) for t in ts],
+        "exponential_search": lambda ts: [exponential_search(keys, t) for t in ts],
+        "search_many[bisect]": lambda ts: search_many(keys, ts, method="bisect"),
+        "SortedIndex.find": lambda ts: [sorted_index.find(t) for t in ts],
+        "LearnedIndex.find": lambda ts: [learned.find(t) for t in ts],
+    }
+    if np is not None:
+        np_keys = np.asarray(keys, dtype=np.int64)
+        impls["search_many[numpy]"] = lambda ts: search_many(
+            np_keys, ts, method="numpy"
+        )
+    return impls
+
+
+def run_suite(
+    sizes: list[int],
+    queries: int,
+    repeat: int = 3,
+    distributions: tuple[str, ...] = SUITE_DISTRIBUTIONS,
+    hit_ratios: tuple[float, ...] = SUITE_HIT_RATIOS,
+    seed: int = 0,
+) -> dict[str, float]:
+    """返回 {用例名: 每次查询的纳秒数}，取 `repeat` 轮运行中的最小值以压低噪声。
+
+    用例名形如 "binary_search/uniform/n=1000/hit=0.5"。
+    """
+    results: dict[str, float] = {}
+    for distribution in distributions:
+        for size in sizes:
+            rng = random.Random(seed)
+            keys = _make_keys(distribution, size, rng)
+            impls = suite_implementations(keys)
+            for hit_ratio in hit_ratios:
+                targets = _make_targets(keys, queries, hit_ratio, rng)
+                # 各实现轮流运行 repeat 轮，避免机器负载的短时波动集中落在某一项上。
+                best = dict.fromkeys(impls, float("inf"))
+                for _ in range(repeat):
+                    for name, run in impls.items():
+                        seconds = _timeit(lambda run=run, targets=targets: run(targets))
+                        best[name] = min(best[name], seconds)
+                for name, seconds in best.items():
+                    case = f"{name}/{distribution}/n={size}/hit={hit_ratio}"
+                    results[case] = seconds / queries * 1e9
+    return results
+
+
+def _environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "numpy": np.__version__ if np is not None else "",
+    }
+
+
+def save_baseline(path: Path, results: dict[str, float]) -> None:
+    rounded = {case: round(ns, 1) for case, ns in results.items()}
+    data = {"environment": _environment(), "results_ns": rounded}
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare_to_baseline(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[tuple[str, float, float]]:
+    """返回比基线慢超过 `threshold`（相对比例）的用例：(用例名, 基线 ns, 本次 ns)。
+
+    只比较两边都有的用例；新增或删除的用例不算回归。
+    """
+    regressions = []
+    for case, now in sorted(results.items()):
+        base = baseline.get(case)
+        if base is not None and now > base * (1 + threshold):
+            regressions.append((case, base, now))
+    return regressions
+
+
+def suite_main(args: argparse.Namespace) -> int:
+    """--suite 的入口，返回进程退出码。"""
+    results = run_suite(args.suite_sizes, args.suite_queries, args.repeat)
+    for case, ns in results.items():
+        print(f"{case:<55} {ns:9.0f} ns/query")
+
+    path = Path(args.baseline)
+    if args.update_baseline or not path.exists():
+        save_baseline(path, results)
+        print(f"基线已写入 {path}")
+        return 0
+
+    baseline = load_baseline(path)
+    if baseline.get("environment") != _environment():
+        print(
+            "警告：基线记录于不同的环境，比较结果仅供参考：",
+            baseline.get("environment"),
+        )
+    regressions = compare_to_baseline(
+        results, baseline["results_ns"], args.threshold
+    )
+    for case, base, now in regressions:
+        print(f"回归 {case}: {base:.0f} -> {now:.0f} ns/query (x{now / base:.2f})")
+    if regressions:
+        print(f"{len(regressions)} 项超过阈值 {args.threshold:.0%}")
+        return 1
+    print(f"全部 {len(results)} 项均在阈值 {args.threshold:.0%} 以内")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ds_algo search benchmark")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10**3, 10**6, 10**8]
+    )
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument(
+        "--index-sizes", type=int, nargs="+", default=[10**3, 10**6]
+    )
+    parser.add_argument("--mixed-size", type=int, default=10**6)
+    parser.add_argument("--mixed-ops", type=int, default=100_000)
+    parser.add_argument(
+        "--write-ratios", type=float, nargs="+", default=[0.1, 0.5, 0.9]
+    )
+    parser.add_argument("--learned-size", type=int, default=10**6)
+
+    # 回归套件
+    parser.add_argument("--suite", action="store_true", help="运行回归套件并对比基线")
+    parser.add_argument(
+        "--suite-sizes", type=int, nargs="+", default=[10**3, 10**5]
+    )
+    parser.add_argument("--suite-queries", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3, help="每项取最小值的运行次数")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="允许比基线慢的比例（默认 0.25）"
+    )
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(suite_main(args))
+
+    for size in args.sizes:
+        results = bench_search_many(size, args.queries)
+        base = results["binary_search"]
+        print(f"== n={size:,}, queries={args.queries:,} ==")
+        for name, seconds in results.items():
+            print(f"{name:>17}: {seconds * 1e3:9.2f} ms  x{base / seconds:.2f}")
+
+    for size in args.index_sizes:
+        result = bench_sorted_index(size, args.queries)
+        print(f"== SortedIndex n={size:,}, queries={args.queries:,} ==")
+        for name, nbytes in result["memory"].items():
+            print(f"{name:>23}: {nbytes / 2**20:9.2f} MiB")
+        for name, ns in result["latency_ns"].items():
+            print(f"{name:>23}: {ns:9.0f} ns/query")
+
+    for ratio in args.write_ratios:
+        result = bench_mixed_workload(args.mixed_size, args.mixed_ops, ratio)
+        base = result["list+insort"]
+        print(
+            f"== 读写混合 n={args.mixed_size:,}, ops={args.mixed_ops:,}, "
+            f"写比例={ratio:.0%} =="
+        )
+        for name, seconds in result.items():
+            print(f"{name:>17}: {seconds * 1e3:9.2f} ms  x{base / seconds:.2f}")
+
+    result = bench_learned_index(args.learned_size, args.queries)
+    print(
+        f"== 学习索引 n={args.learned_size:,}, queries={args.queries:,}, "
+        f"段数={result['segments']} =="
+    )
+    for name, probes in result["probes"].items():
+        ns = result["latency_ns"][name]
+        print(f"{name:>20}: {probes:6.1f} probes  {ns:9.0f} ns/query")
+
+
+if __name__ == "__main__":
+    main()
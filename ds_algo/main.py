@@ -1,7 +1,29 @@
+import mmap
+import struct
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from itertools import pairwise
+from pathlib import Path
 
+try:  # NumPy 为可选依赖：没有安装时 search_many 退回纯 Python 实现
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
 
-def binary_search(arr: list[int], target: int) -> int:
-    """在有序数组中查找目标，返回索引，未找到返回 -1"""
+# search_many(method="auto") 对非 ndarray 的数组只在目标数不少于数组长度的
+# 1/_AUTO_NUMPY_RATIO 时才用 NumPy：np.asarray(list) 每次都是一次 O(n) 复制。
+_AUTO_NUMPY_RATIO = 8
+
+
+def binary_search(arr: list[int], target: int, key: Callable | None = None) -> int:
+    """在有序数组中查找目标，返回索引，未找到返回 -1
+
+    传入 key 时按 `key(元素)` 比较（数组须按 key 升序），返回最左边的匹配位置。
+    """
+    if key is not None:
+        i = lower_bound(arr, target, key=key)
+        return i if i < len(arr) and key(arr[i]) == target else -1
     left, right = 0, len(arr) - 1
     while left <= right:
         mid = (left + right) // 2
@@ -14,5 +36,704 @@ def binary_search(arr: list[int], target: int) -> int:
     return -1
 
 
+# 下面的区间查询都基于 bisect：传入 key 时 bisect 只对二分过程中实际探测到的元素
+# 调用 key，不会为整张表预先生成一份键列表。数组须按 key（或元素本身）升序排列；
+# 降序数据可以传入取负的 key，例如 key=lambda m: -m["rating"]。
+
+
+def lower_bound(arr: Sequence, target, key: Callable | None = None) -> int:
+    """第一个 >= target 的位置，不存在时返回 len(arr)。"""
+    return bisect_left(arr, target, key=key)
+
+
+def upper_bound(arr: Sequence, target, key: Callable | None = None) -> int:
+    """第一个 > target 的位置，不存在时返回 len(arr)。"""
+    return bisect_right(arr, target, key=key)
+
+
+def equal_range(
+    arr: Sequence, target, key: Callable | None = None
+) -> tuple[int, int]:
+    """等于 target 的元素所在的半开区间 [start, end)，不存在时 start == end。"""
+    start = bisect_left(arr, target, key=key)
+    end = bisect_right(arr, target, lo=start, key=key)
+    return start, end
+
+
+def count_in_range(arr: Sequence, lo, hi, key: Callable | None = None) -> int:
+    """统计落在半开区间 [lo, hi) 内的元素个数，两次二分，O(log n) 次 key 调用。
+
+    示例：
+    >>> movies = [{"rating": 8.1}, {"rating": 8.9}, {"rating": 9.2}, {"rating": 9.7}]
+    >>> count_in_range(movies, 9.0, 10.0, key=lambda m: m["rating"])
+    2
+    """
+    start = bisect_left(arr, lo, key=key)
+    end = bisect_left(arr, hi, lo=start, key=key)
+    return max(0, end - start)
+
+
+def _search_many_numpy(arr, targets):
+    a = np.asarray(arr)
+    t = np.asarray(targets)
+    idx = np.searchsorted(a, t, side="left")
+    if len(a) == 0:
+        return np.full(t.shape, -1, dtype=np.int64)
+    found = (idx < len(a)) & (a[np.minimum(idx, len(a) - 1)] == t)
+    return np.where(found, idx, -1).astype(np.int64)
+
+
+def _search_many_merge(arr: Sequence[int], targets: list[int]) -> list[int]:
+    # 目标已升序：每次查找的下界从上一次的位置开始，区间单调右移，
+    # 相当于用二分跳跃代替逐个前进的归并扫描。
+    n = len(arr)
+    out = []
+    lo = 0
+    for t in targets:
+        lo = bisect_left(arr, t, lo)
+        out.append(lo if lo < n and arr[lo] == t else -1)
+    return out
+
+
+def _search_many_bisect(arr: Sequence[int], targets: Iterable[int]) -> list[int]:
+    n = len(arr)
+    out = []
+    for t in targets:
+        i = bisect_left(arr, t)
+        out.append(i if i < n and arr[i] == t else -1)
+    return out
+
+
+def search_many(arr: Sequence[int], targets: Iterable[int], method: str = "auto"):
+    """对同一个有序数组批量查找多个目标，返回与 targets 一一对应的索引，未找到为 -1。
+
+    method:
+    - "numpy": `np.searchsorted` 一次完成全部查找，返回 int64 的 ndarray；
+    - "merge": 目标已升序时，每次查找从上一次结果处开始（归并式推进）；
+    - "bisect": 对每个目标调用 `bisect.bisect_left`；
+    - "auto"（默认）: 安装了 NumPy 且 arr 已是 ndarray，或目标数不少于 arr 长度的
+      1/8（复制数组的 O(n) 开销能被摊薄）时用 "numpy"；否则目标有序用 "merge"，
+      再否则 "bisect"。对同一个 list 反复做小批量查找时不会每次都复制整个数组。
+
+    "numpy" 返回 ndarray，"merge"/"bisect" 返回 list[int]；"auto" 的返回类型只取决于
+    arr：arr 是 ndarray 时返回 ndarray，否则总是 list[int]（即使内部用了 NumPy），
+    同一调用处不会因输入规模不同而拿到不同类型。数组中有重复元素时返回最左边的位置
+    （`binary_search` 只保证返回某个匹配位置）。
+    """
+    if method == "auto":
+        if np is not None and isinstance(arr, np.ndarray):
+            method = "numpy"
+        else:
+            if np is None or not isinstance(targets, np.ndarray):
+                targets = list(targets)
+            if np is not None and len(targets) * _AUTO_NUMPY_RATIO >= len(arr):
+                return _search_many_numpy(arr, targets).tolist()
+            if all(a <= b for a, b in pairwise(targets)):
+                method = "merge"
+            else:
+                method = "bisect"
+
+    if method == "numpy":
+        if np is None:
+            raise ValueError('method="numpy" 需要安装 NumPy')
+        return _search_many_numpy(arr, targets)
+    if method == "merge":
+        return _search_many_merge(arr, list(targets))
+    if method == "bisect":
+        return _search_many_bisect(arr, targets)
+    raise ValueError(f"未知的 method: {method!r}")
+
+
+def interpolation_search(arr: Sequence[int], target: int) -> int:
+    """插值查找：按目标值在区间两端键值之间的比例估计位置。
+
+    键接近均匀分布时期望只需 O(log log n) 次探测；返回约定同 `binary_search`。
+    """
+    lo, hi = 0, len(arr) - 1
+    while lo <= hi:
+        a, b = arr[lo], arr[hi]
+        if not a <= target <= b:
+            return -1
+        if a == b:
+            return lo
+        pos = lo + (target - a) * (hi - lo) // (b - a)
+        v = arr[pos]
+        if v == target:
+            return pos
+        if v < target:
+            lo = pos + 1
+        else:
+            hi = pos - 1
+    return -1
+
+
+def exponential_search(arr: Sequence[int], target: int) -> int:
+    """指数（倍增）查找：不调用 len()，适合长度未知、只能按下标读取的流式序列。
+
+    依次探测下标 0, 1, 3, 7, ...，越界（IndexError）视为 +∞，找到上界后在
+    最后一段内二分。代价为 O(log i)，i 为目标所在位置；返回最左的匹配下标或 -1。
+    """
+
+    def at(i: int) -> int | None:
+        try:
+            return arr[i]
+        except IndexError:
+            return None
+
+    bound = 1
+    while (v := at(bound - 1)) is not None and v < target:
+        bound *= 2
+    # 此时 arr[bound // 2 - 1] < target，答案落在 [bound // 2, bound - 1]。
+    lo, hi = bound // 2, bound - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        v = at(mid)
+        if v is not None and v < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo if at(lo) == target else -1
+
+
+class LearnedIndex:
+    """分段线性学习索引：用若干线段拟合“键 -> 有序位置”，再做有界的局部查找。
+
+    拟合采用贪心的收缩锥（shrinking cone）算法：每段从一个点出发，维护能让段内
+    所有点预测误差都不超过 `max_error` 的斜率区间，区间为空时开启新段。
+    键越接近均匀分布，段数越少（均匀数据通常只需一段）。
+
+    查找：在段起点上二分选出线段 -> 预测位置 -> 在 [预测 - max_error,
+    预测 + max_error + 1] 内二分。窗口边界会先校验，遇到重复键或查询值落在
+    拟合点之外而使窗口不够时按指数步长扩大，因此结果总是正确的。
+
+    `keys` 只保存引用、不复制；`probes` 累计读取 keys 的次数，便于与
+    `binary_search` 的 log2(n) 次探测比较。
+    """
+
+    def __init__(self, keys: Sequence[int], max_error: int = 32):
+        if max_error < 0:
+            raise ValueError("max_error 不能为负数")
+        self._keys = keys
+        self._n = n = len(keys)
+        self.max_error = eps = max_error
+        self.probes = 0
+        self._starts: list[int] = []
+        self._ys: list[int] = []
+        self._slopes: list[float] = []
+
+        i = 0
+        while i < n:
+            x0 = keys[i]
+            smin, smax = float("-inf"), float("inf")
+            j = i + 1
+            while j < n:
+                dx = keys[j] - x0
+                if dx == 0:
+                    # 与起点相同的重复键只能预测为起点位置。
+                    if j - i > eps:
+                        break
+                else:
+                    lo_s = max(smin, (j - eps - i) / dx)
+                    hi_s = min(smax, (j + eps - i) / dx)
+                    if lo_s > hi_s:
+                        break
+                    smin, smax = lo_s, hi_s
+                j += 1
+            slope = 0.0 if smin == float("-inf") else (smin + smax) / 2
+            self._starts.append(x0)
+            self._ys.append(i)
+            self._slopes.append(slope)
+            i = j
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def segments(self) -> int:
+        return len(self._starts)
+
+    def lower_bound(self, target: int) -> int:
+        """第一个 >= target 的位置，不存在时返回 len(keys)。"""
+        keys, n = self._keys, self._n
+        s = bisect_right(self._starts, target) - 1
+        if s < 0:
+            return 0
+        pred = int(self._ys[s] + self._slopes[s] * (target - self._starts[s]))
+        lo = min(n, max(0, pred - self.max_error))
+        hi = min(n, max(lo, pred + self.max_error + 1))
+
+        # 不变式：答案在 [lo, hi] 内，且 lo == 0 或 keys[lo-1] < target，
+        # hi == n 或 keys[hi] >= target。先校验并按需扩大预测窗口。
+        probes = 0
+        step = self.max_error + 1
+        while lo > 0:
+            probes += 1
+            if keys[lo - 1] < target:
+                break
+            hi = lo - 1
+            lo = max(0, lo - step)
+            step *= 2
+        while hi < n:
+            probes += 1
+            if keys[hi] >= target:
+                break
+            lo = hi + 1
+            hi = min(n, hi + step)
+            step *= 2
+        # 窗口内用 C 实现的 bisect 收尾，探测次数约为窗口长度的位数。
+        self.probes += probes + (hi - lo).bit_length()
+        return bisect_left(keys, target, lo, hi)
+
+    def find(self, target: int) -> int:
+        """与 `binary_search` 相同的约定：返回下标（重复时取最左），未找到返回 -1。"""
+        i = self.lower_bound(target)
+        if i < self._n and self._keys[i] == target:
+            self.probes += 1
+            return i
+        return -1
+
+
+class SortedIndex:
+    """只读有序索引：键按 Eytzinger（BFS/堆序）布局存放在紧凑的 `array('q')` 中。
+
+    位置 k 的左右孩子在 2k、2k+1，查找路径上的前几层集中在数组开头，
+    比在大列表上做二分更省缓存；每个键只占 8 字节（另有 8 字节的位置映射），
+    而 list[int] 每个元素约 36 字节（指针 + int 对象）。
+
+    查找是无分支风格的下降：`k = 2k + (key < target)`，走到叶子后用位运算
+    回退到下界所在的节点，再通过 `_pos` 映射回原有序数组中的下标，
+    因此 `find` 可以直接替代 `binary_search`。
+
+    示例：
+    >>> idx = SortedIndex([1, 3, 5, 7])
+    >>> idx.find(5), idx.find(4), idx.lower_bound(4)
+    (2, -1, 2)
+    """
+
+    def __init__(self, keys: Iterable[int]):
+        keys = array("q", keys)
+        if any(a > b for a, b in pairwise(keys)):
+            raise ValueError("keys 必须按升序排列")
+        n = len(keys)
+        self._n = n
+        # 下标 0 不使用，节点从 1 开始编号。
+        self._keys = array("q", bytes(8 * (n + 1)))
+        self._pos = array("q", bytes(8 * (n + 1)))
+        # 中序遍历 BFS 树，依次填入有序键，即得到 Eytzinger 布局。
+        i = 0
+        stack: list[int] = []
+        k = 1
+        while stack or k <= n:
+            while k <= n:
+                stack.append(k)
+                k *= 2
+            k = stack.pop()
+            self._keys[k] = keys[i]
+            self._pos[k] = i
+            i += 1
+            k = 2 * k + 1
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, target: int) -> bool:
+        return self.find(target) != -1
+
+    @property
+    def nbytes(self) -> int:
+        """键与位置映射两个缓冲区占用的字节数。"""
+        return (len(self._keys) + len(self._pos)) * self._keys.itemsize
+
+    def _descend(self, target: int) -> int:
+        keys = self._keys
+        n = self._n
+        k = 1
+        while k <= n:
+            k = 2 * k + (keys[k] < target)
+        # 去掉末尾连续的 1 以及其后的一个 0（即最后一次“向左走”），回到下界节点；
+        # 结果为 0 表示 target 大于所有键。
+        return k >> (~k & (k + 1)).bit_length()
+
+    def lower_bound(self, target: int) -> int:
+        """第一个 >= target 的键在原有序数组中的下标，不存在时返回 len(self)。"""
+        k = self._descend(target)
+        return self._pos[k] if k else self._n
+
+    def find(self, target: int) -> int:
+        """与 `binary_search` 相同的约定：返回原有序数组中的下标，未找到返回 -1。"""
+        k = self._descend(target)
+        if k and self._keys[k] == target:
+            return self._pos[k]
+        return -1
+
+    def search_many(self, targets: Iterable[int]):
+        """批量 `find`。安装了 NumPy 时所有目标按层同步下降（零拷贝读取缓冲区），
+        返回 int64 ndarray；否则逐个查找，返回 list[int]。"""
+        if np is None:
+            return [self.find(t) for t in targets]
+        keys = np.frombuffer(self._keys, dtype=np.int64)
+        pos = np.frombuffer(self._pos, dtype=np.int64)
+        t = np.asarray(targets, dtype=np.int64)
+        k = np.ones(t.shape, dtype=np.int64)
+        for _ in range(self._n.bit_length()):
+            active = k <= self._n
+            k = np.where(active, 2 * k + (keys[np.minimum(k, self._n)] < t), k)
+        # 与 _descend 相同的回退：~k & (k + 1) 是最低位 0 对应的 2 的幂，
+        # 右移 (末尾 1 的个数 + 1) 位等价于整除它的两倍。
+        k = k // (2 * (~k & (k + 1)))
+        found = (k > 0) & (keys[k] == t)
+        return np.where(found, pos[k], -1)
+
+
+class BlockedSortedList:
+    """可变有序容器：由若干有界的有序小块组成，插入/删除不需要整体重排。
+
+    结构：
+    - `_lists`: 有序小块列表，每块长度不超过 `2 * load`，超过时对半拆分；
+    - `_maxes`: 每块的最大值，先在它上面二分定位块，再在块内二分；
+    - `_tree`: 各块长度的树状数组（Fenwick），用于全局下标与 (块, 块内偏移) 互转。
+
+    插入/删除只移动一个小块内的元素（O(load)）并更新树状数组（O(log 块数)），
+    块数变化（拆分、删空）时才重建树状数组。
+
+    示例：
+    >>> s = BlockedSortedList([5, 1, 3])
+    >>> s.add(4)
+    >>> list(s), s.index_of(4), s.lower_bound(2), list(s.irange(2, 5))
+    ([1, 3, 4, 5], 2, 1, [3, 4])
+    """
+
+    def __init__(self, values: Iterable[int] = (), load: int = 1000):
+        if load <= 0:
+            raise ValueError("load 必须为正整数")
+        self._load = load
+        data = sorted(values)
+        self._lists = [data[i : i + load] for i in range(0, len(data), load)]
+        self._maxes = [chunk[-1] for chunk in self._lists]
+        self._len = len(data)
+        self._build_index()
+
+    # ---- 树状数组：下标 i 对应第 i 块（1 开始存放） ----
+
+    def _build_index(self) -> None:
+        tree = [0] + [len(chunk) for chunk in self._lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _update(self, chunk: int, delta: int) -> None:
+        i = chunk + 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _offset(self, chunk: int) -> int:
+        """前 `chunk` 块的元素总数，即第 `chunk` 块首元素的全局下标。"""
+        total = 0
+        i = chunk
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """全局下标 -> (块号, 块内偏移)，在树状数组上自顶向下二分。"""
+        tree = self._tree
+        chunk = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = chunk + step
+            if nxt < len(tree) and tree[nxt] <= index:
+                chunk = nxt
+                index -= tree[nxt]
+            step >>= 1
+        return chunk, index
+
+    # ---- 修改 ----
+
+    def add(self, value: int) -> None:
+        """插入一个值（允许重复）。"""
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            self._build_index()
+            return
+
+        i = bisect_right(self._maxes, value)
+        if i == len(self._maxes):
+            # 比所有块的最大值都大：追加到最后一块。
+            i -= 1
+            self._lists[i].append(value)
+            self._maxes[i] = value
+        else:
+            insort(self._lists[i], value)
+        self._len += 1
+
+        chunk = self._lists[i]
+        if len(chunk) > 2 * self._load:
+            half = len(chunk) // 2
+            self._lists[i : i + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[i : i + 1] = [chunk[half - 1], chunk[-1]]
+            self._build_index()
+        else:
+            self._update(i, 1)
+
+    def remove(self, value: int) -> None:
+        """删除一个等于 value 的元素，不存在时抛出 ValueError（同 list.remove）。"""
+        i = bisect_left(self._maxes, value)
+        if i < len(self._maxes):
+            chunk = self._lists[i]
+            j = bisect_left(chunk, value)
+            if chunk[j] == value:
+                del chunk[j]
+                self._len -= 1
+                if chunk:
+                    self._maxes[i] = chunk[-1]
+                    self._update(i, -1)
+                else:
+                    del self._lists[i]
+                    del self._maxes[i]
+                    self._build_index()
+                return
+        raise ValueError(f"{value!r} 不在容器中")
+
+    def discard(self, value: int) -> None:
+        """删除一个等于 value 的元素，不存在时什么也不做。"""
+        try:
+            self.remove(value)
+        except ValueError:
+            pass
+
+    # ---- 查询 ----
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[int]:
+        for chunk in self._lists:
+            yield from chunk
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return False
+        chunk = self._lists[i]
+        return chunk[bisect_left(chunk, value)] == value
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("BlockedSortedList 下标越界")
+        chunk, offset = self._locate(index)
+        return self._lists[chunk][offset]
+
+    def lower_bound(self, value: int) -> int:
+        """第一个 >= value 的元素的全局下标，不存在时返回 len(self)。"""
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return self._len
+        return self._offset(i) + bisect_left(self._lists[i], value)
+
+    def upper_bound(self, value: int) -> int:
+        """第一个 > value 的元素的全局下标，不存在时返回 len(self)。"""
+        i = bisect_right(self._maxes, value)
+        if i == len(self._maxes):
+            return self._len
+        return self._offset(i) + bisect_right(self._lists[i], value)
+
+    def index_of(self, value: int) -> int:
+        """与 `binary_search` 相同的约定：返回下标（重复时取最左），未找到返回 -1。"""
+        pos = self.lower_bound(value)
+        if pos < self._len and self[pos] == value:
+            return pos
+        return -1
+
+    def irange(self, lo: int | None = None, hi: int | None = None) -> Iterator[int]:
+        """按升序迭代半开区间 [lo, hi) 内的元素，None 表示该侧不设界。
+
+        只定位起点所在的块，之后顺序扫描，不会复制或重建任何数据。
+        """
+        if not self._lists:
+            return
+        if lo is None:
+            i, j = 0, 0
+        else:
+            i = bisect_left(self._maxes, lo)
+            if i == len(self._maxes):
+                return
+            j = bisect_left(self._lists[i], lo)
+        for chunk in self._lists[i:]:
+            for k in range(j, len(chunk)):
+                value = chunk[k]
+                if hi is not None and value >= hi:
+                    return
+                yield value
+            j = 0
+
+
+class SortedRecordFile:
+    """磁盘上的定长有序记录文件，通过只读 mmap 直接二分查找，不把数据读进列表。
+
+    文件格式（小端）：
+    - 16 字节文件头：魔数 b"SRF1"、值宽度 value_size（uint32）、记录数（uint64）；
+    - 之后是按键升序排列的定长记录：int64 键 + value_size 字节的值。
+
+    查找时每次探测只用 `struct.unpack_from` 从 mmap 读出 8 字节的键，
+    只有被探测到的页会被操作系统换入；在支持的平台上还会设置 MADV_RANDOM，
+    关闭预读。`track_pages=True` 时记录每次查询触碰的页数，便于调参。
+
+    示例：
+    >>> SortedRecordFile.build("ids.srf", [1, 5, 9])      # doctest: +SKIP
+    >>> with SortedRecordFile("ids.srf") as f:            # doctest: +SKIP
+    ...     f.binary_search(5)
+    1
+    """
+
+    MAGIC = b"SRF1"
+    _HEADER = struct.Struct("<4sIQ")
+    _KEY = struct.Struct("<q")
+
+    @classmethod
+    def build(
+        cls,
+        path: str | Path,
+        records: Iterable[int] | Iterable[tuple[int, bytes]],
+        value_size: int = 0,
+    ) -> int:
+        """把已按键升序排列的记录流式写入 `path`，返回写入的记录数。
+
+        records 的元素可以是单独的键（value_size 须为 0），也可以是 (键, 值) 二元组，
+        值不足 value_size 时补 0，超过时抛出 ValueError；键未升序时同样抛出 ValueError。
+        """
+        count = 0
+        prev = None
+        with open(path, "wb") as f:
+            f.write(cls._HEADER.pack(cls.MAGIC, value_size, 0))
+            for rec in records:
+                key, value = (rec, b"") if isinstance(rec, int) else rec
+                if prev is not None and key < prev:
+                    raise ValueError("记录必须按键升序排列")
+                if len(value) > value_size:
+                    raise ValueError(f"值超过 value_size={value_size} 字节")
+                f.write(cls._KEY.pack(key))
+                f.write(value.ljust(value_size, b"\0"))
+                prev = key
+                count += 1
+            # 写完后回填记录数。
+            f.seek(0)
+            f.write(cls._HEADER.pack(cls.MAGIC, value_size, count))
+        return count
+
+    def __init__(self, path: str | Path, track_pages: bool = False):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            # 文件过短或已损坏时 unpack_from 抛出 struct.error，同样要关闭已打开的资源。
+            magic, self.value_size, self._n = self._HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC:
+                raise ValueError(f"{path} 不是有序记录文件")
+            self._record_size = self._KEY.size + self.value_size
+            if hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_RANDOM"):
+                self._mm.madvise(mmap.MADV_RANDOM)
+        except Exception:
+            self.close()
+            raise
+
+        self.track_pages = track_pages
+        self.queries = 0
+        self.pages_touched = 0  # 累计触碰的页数（每次查询内去重）
+        self.last_pages_touched = 0
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "SortedRecordFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _offset(self, i: int) -> int:
+        return self._HEADER.size + i * self._record_size
+
+    def key_at(self, i: int) -> int:
+        return self._KEY.unpack_from(self._mm, self._offset(i))[0]
+
+    def value_at(self, i: int) -> bytes:
+        start = self._offset(i) + self._KEY.size
+        return self._mm[start : start + self.value_size]
+
+    def lower_bound(self, target: int, lo: int = 0) -> int:
+        """第一个键 >= target 的记录下标，不存在时返回 len(self)。"""
+        hi = self._n
+        mm = self._mm
+        unpack = self._KEY.unpack_from
+        header, size = self._HEADER.size, self._record_size
+        pages = set() if self.track_pages else None
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = header + mid * size
+            if pages is not None:
+                pages.add(off // mmap.PAGESIZE)
+            if unpack(mm, off)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if pages is not None:
+            self.queries += 1
+            self.last_pages_touched = len(pages)
+            self.pages_touched += len(pages)
+        return lo
+
+    def binary_search(self, target: int) -> int:
+        """与 `binary_search` 相同的约定：返回记录下标，未找到返回 -1。
+
+        键重复时取最左的一条。
+        """
+        i = self.lower_bound(target)
+        return i if i < self._n and self.key_at(i) == target else -1
+
+    def search_many(self, targets: Iterable[int]) -> list[int]:
+        """批量查找：按目标排序后依次查找，每次的下界从上一次结果开始，
+        相邻目标落在同一片区域时复用已换入的页。返回顺序与 targets 一致。"""
+        targets = list(targets)
+        out = [-1] * len(targets)
+        lo = 0
+        for j in sorted(range(len(targets)), key=targets.__getitem__):
+            t = targets[j]
+            lo = self.lower_bound(t, lo)
+            if lo < self._n and self.key_at(lo) == t:
+                out[j] = lo
+        return out
+
+    def stats(self) -> dict:
+        """开启 track_pages 后的页访问统计。"""
+        return {
+            "queries": self.queries,
+            "pages_touched": self.pages_touched,
+            "pages_per_query": (
+                self.pages_touched / self.queries if self.queries else 0.0
+            ),
+            "page_size": mmap.PAGESIZE,
+        }
+
+
 if __name__ == "__main__":
     print(binary_search([1, 3, 5, 7], 5))
+    print(search_many([1, 3, 5, 7], [7, 2, 1]))
+    print(SortedIndex([1, 3, 5, 7]).find(5))
+    print(list(BlockedSortedList([7, 3, 5, 1]).irange(2, 6)))
@@ -1,4 +1,25 @@
-from ds_algo.main import binary_search
+import random
+import struct
+from bisect import bisect_left, bisect_right, insort
+
+import pytest
+
+from ds_algo import bench
+from ds_algo import main as ds_main
+from ds_algo.main import (
+    BlockedSortedList,
+    LearnedIndex,
+    SortedIndex,
+    SortedRecordFile,
+    binary_search,
+    count_in_range,
+    equal_range,
+    exponential_search,
+    interpolation_search,
+    lower_bound,
+    search_many,
+    upper_bound,
+)
 
 
 def test_binary_search_found():
@@ -12,3 +33,206 @@ def test_binary_search_not_found():
 def test_binary_search_edge_cases():
     assert binary_search([], 1) == -1
     assert binary_search([5], 5) == 0
+
+
+def test_search_many_matches_binary_search():
+    arr = [1, 3, 5, 7, 9, 11]
+    targets = [7, 0, 1, 12, 11, 4, 5]
+    expected = [binary_search(arr, t) for t in targets]
+    assert search_many(arr, targets) == expected  # auto：list 输入总是返回 list
+    assert search_many(arr, targets, method="bisect") == expected
+    ordered = sorted(targets)
+    assert search_many(arr, ordered, method="merge") == [
+        binary_search(arr, t) for t in ordered
+    ]
+
+
+def test_search_many_empty_and_duplicates():
+    assert search_many([], [1, 2]) == [-1, -1]
+    assert search_many([1, 2, 2, 2, 3], [2], method="bisect") == [1]
+    with pytest.raises(ValueError):
+        search_many([1], [1], method="nope")
+
+
+def test_search_many_numpy():
+    np = pytest.importorskip("numpy")
+    out = search_many(np.array([2, 4, 6]), [6, 5, 2], method="numpy")
+    assert out.tolist() == [2, -1, 0]
+    # auto：返回类型只看 arr——ndarray 进 ndarray 出，list 进 list 出，
+    # 与内部是否用了 NumPy（大批量）或 bisect（对大 list 的小批量）无关
+    assert isinstance(search_many(np.array([2, 4, 6]), [4]), np.ndarray)
+    assert search_many([1, 3, 5], [3]) == [1]
+    assert search_many(list(range(100)), [3]) == [3]
+    for out in (search_many([1, 3, 5], [3]), search_many(list(range(100)), [3])):
+        assert type(out) is list and type(out[0]) is int
+
+
+def test_sorted_index_matches_binary_search_and_bisect():
+    for n in range(0, 20):
+        arr = list(range(0, 2 * n, 2))
+        idx = SortedIndex(arr)
+        assert len(idx) == n
+        for t in range(-1, 2 * n + 2):
+            assert idx.find(t) == binary_search(arr, t)
+            assert idx.lower_bound(t) == bisect_left(arr, t)
+        targets = list(range(-1, 2 * n + 2))
+        assert list(idx.search_many(targets)) == [idx.find(t) for t in targets]
+
+
+def test_sorted_index_rejects_unsorted_keys():
+    with pytest.raises(ValueError):
+        SortedIndex([3, 1, 2])
+    assert 3 in SortedIndex([1, 3])
+    assert SortedIndex([1, 2, 3]).nbytes == 2 * 4 * 8
+
+
+def test_blocked_sorted_list_matches_sorted_reference():
+    # 小块容量很小，频繁触发拆分与删空块
+    rng = random.Random(0)
+    ref: list[int] = []
+    s = BlockedSortedList(load=2)
+    for _ in range(500):
+        v = rng.randrange(30)
+        if rng.random() < 0.6 or v not in ref:
+            s.add(v)
+            insort(ref, v)
+        else:
+            s.remove(v)
+            ref.remove(v)
+    assert list(s) == ref
+    assert [s[i] for i in range(len(s))] == ref
+    for t in range(-1, 32):
+        assert s.lower_bound(t) == bisect_left(ref, t)
+        assert s.upper_bound(t) == bisect_right(ref, t)
+        assert s.index_of(t) == (bisect_left(ref, t) if t in ref else -1)
+        assert list(s.irange(t, t + 5)) == [x for x in ref if t <= x < t + 5]
+
+
+def test_blocked_sorted_list_remove_missing():
+    s = BlockedSortedList([1, 2, 3])
+    with pytest.raises(ValueError):
+        s.remove(5)
+    s.discard(5)
+    assert s.index_of(5) == -1
+    assert list(s.irange(hi=3)) == [1, 2]
+
+
+def test_range_queries_on_ints():
+    arr = [1, 2, 2, 2, 5, 7]
+    assert lower_bound(arr, 2) == 1
+    assert upper_bound(arr, 2) == 4
+    assert equal_range(arr, 2) == (1, 4)
+    assert equal_range(arr, 3) == (4, 4)
+    assert count_in_range(arr, 2, 7) == 4
+    assert count_in_range(arr, 7, 2) == 0
+
+
+def test_key_is_evaluated_lazily_on_probed_records():
+    movies = [{"title": f"m{i}", "rating": i / 10} for i in range(1024)]
+    calls = 0
+
+    def rating(m):
+        nonlocal calls
+        calls += 1
+        return m["rating"]
+
+    assert count_in_range(movies, 50.0, 60.0, key=rating) == 100
+    assert calls <= 2 * 11  # 两次二分，每次最多 log2(1024)+1 次
+    assert binary_search(movies, 9.0, key=rating) == 90
+    assert binary_search(movies, 9.05, key=rating) == -1
+
+
+def test_sorted_record_file_search(tmp_path):
+    path = tmp_path / "ids.srf"
+    keys = list(range(0, 20_000, 2))
+    assert SortedRecordFile.build(path, keys) == len(keys)
+    with SortedRecordFile(path, track_pages=True) as f:
+        assert len(f) == len(keys)
+        for t in (0, 1, 2, 9_998, 19_998, 19_999, -5):
+            assert f.binary_search(t) == binary_search(keys, t)
+            assert f.lower_bound(t) == bisect_left(keys, t)
+        assert f.search_many([19_998, 3, 0]) == [9_999, -1, 0]
+        stats = f.stats()
+        assert stats["queries"] > 0
+        # 每次查询触碰的页数不超过二分的探测次数
+        assert 1 <= stats["pages_per_query"] <= len(keys).bit_length()
+
+
+def test_sorted_record_file_values_and_validation(tmp_path):
+    path = tmp_path / "kv.srf"
+    SortedRecordFile.build(path, [(1, b"a"), (3, b"bc")], value_size=4)
+    with SortedRecordFile(path) as f:
+        i = f.binary_search(3)
+        assert f.value_at(i) == b"bc\0\0"
+    with pytest.raises(ValueError):
+        SortedRecordFile.build(tmp_path / "bad.srf", [3, 1])
+
+
+def test_sorted_record_file_closes_on_bad_header(tmp_path, monkeypatch):
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(ds_main, "open", tracking_open, raising=False)
+    short = tmp_path / "short.srf"
+    short.write_bytes(b"SR")  # 比文件头还短
+    wrong = tmp_path / "wrong.srf"
+    wrong.write_bytes(b"\0" * 64)  # 魔数不对
+    with pytest.raises(struct.error):
+        SortedRecordFile(short)
+    with pytest.raises(ValueError):
+        SortedRecordFile(wrong)
+    assert len(opened) == 2 and all(f.closed for f in opened)
+
+
+def test_learned_index_matches_bisect():
+    rng = random.Random(1)
+    uniform = sorted(rng.sample(range(100_000), 2_000))
+    skewed = sorted(int(rng.expovariate(0.01)) for _ in range(2_000))
+    dupes = sorted(rng.randrange(20) for _ in range(300))
+    for arr in (uniform, skewed, dupes, [], [7]):
+        for eps in (0, 4, 32):
+            idx = LearnedIndex(arr, max_error=eps)
+            for t in [-1, 0, 5, 19, 20, 99_999, 100_001] + arr[::97]:
+                assert idx.lower_bound(t) == bisect_left(arr, t)
+                expected = bisect_left(arr, t) if t in arr else -1
+                assert idx.find(t) == expected
+
+
+def test_learned_index_uniform_keys_need_few_probes():
+    keys = list(range(0, 3 * 100_000, 3))
+    idx = LearnedIndex(keys, max_error=8)
+    assert idx.segments == 1
+    for t in keys[::1000]:
+        idx.find(t)
+    # 窗口为 2*8+1，加上边界校验，远小于 log2(1e5) ≈ 17 次
+    assert idx.probes / 100 < 8
+
+
+def test_interpolation_and_exponential_search():
+    arr = [1, 3, 3, 3, 8, 20, 21]
+    for t in range(0, 23):
+        expected = binary_search(arr, t)
+        got = interpolation_search(arr, t)
+        assert (got == -1) == (expected == -1)
+        assert got == -1 or arr[got] == t
+        assert exponential_search(arr, t) == (bisect_left(arr, t) if t in arr else -1)
+    assert exponential_search([], 1) == -1
+
+
+def test_bench_suite_and_baseline_regression_check(tmp_path):
+    results = bench.run_suite([50], queries=20, repeat=1, hit_ratios=(0.5,))
+    assert "binary_search/uniform/n=50/hit=0.5" in results
+    assert all(ns > 0 for ns in results.values())
+
+    path = tmp_path / "baseline.json"
+    bench.save_baseline(path, results)
+    baseline = bench.load_baseline(path)["results_ns"]
+    assert bench.compare_to_baseline(results, baseline, threshold=0.01) == []
+
+    slower = {case: ns * 2 for case, ns in results.items()}
+    slower["new_impl/uniform/n=50/hit=0.5"] = 1.0  # 基线中没有的用例不算回归
+    regressions = bench.compare_to_baseline(slower, baseline, threshold=0.5)
+    assert len(regressions) == len(results)
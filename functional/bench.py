@@ -0,0 +1,274 @@
+"""functional 基准。
+
+运行（在仓库根目录）：
+    python -m functional.bench
+    python -m functional.bench --sizes 100000 1000000 --stream-n 100000000
+    python -m functional.bench --fusion-n 1000000 --sizes --stream-n 0
+    python -m functional.bench --small-calls 100000 --fusion-n 0 --sizes --stream-n 0
+    python -m functional.bench --workers 1 2 4 8 --fusion-n 0 --sizes --stream-n 0
+    python -m functional.bench --vector-n 1000000 --fusion-n 0 --sizes --stream-n 0
+
+内存基准在独立的 spawn 子进程中运行，每个用例的峰值 RSS 互不影响；
+没有 `resource` 模块的平台（Windows）退回用 tracemalloc 统计 Python 分配峰值。
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from functional.main import (
+    apply_pipeline,
+    compile_pipeline,
+    iter_pipeline,
+    vectorized,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+
+def _double(x: int) -> int:
+    return x * 2
+
+
+def _inc(x: int) -> int:
+    return x + 1
+
+
+def _collatz_steps(x: int) -> int:
+    """CPU 密集的纯 Python 阶段：x+1 的 Collatz 序列步数。"""
+    n, steps = x + 1, 0
+    while n != 1:
+        n = n // 2 if n % 2 == 0 else 3 * n + 1
+        steps += 1
+    return steps
+
+
+def _peak_rss() -> int:
+    """当前进程的峰值 RSS（字节）。"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KiB 为单位，macOS 以字节为单位。
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure_memory(mode: str, n: int) -> tuple[int, float]:
+    """在子进程中运行一次管道，返回 (相对启动时增加的峰值内存字节数, 秒数)。"""
+    funcs = [_double, _inc]
+    if resource is None:
+        import tracemalloc
+
+        tracemalloc.start()
+    before = _peak_rss() if resource is not None else 0
+    start = time.perf_counter()
+    if mode == "list":
+        total = sum(apply_pipeline(range(n), funcs))
+    else:
+        total = sum(iter_pipeline(range(n), funcs))
+    seconds = time.perf_counter() - start
+    assert total == n * n, "管道结果错误"  # Σ(2i+1) = n²
+    if resource is None:
+        return tracemalloc.get_traced_memory()[1], seconds
+    return _peak_rss() - before, seconds
+
+
+def _unfused(seq, funcs) -> list:
+    """融合前的 apply_pipeline：每个阶段各走一遍 map 并物化一个中间列表。"""
+    result = list(seq)
+    for f in funcs:
+        result = list(map(f, result))
+    return result
+
+
+def _fusion_stages(k: int) -> list:
+    """k 个阶段，简单 lambda（可内联）与普通函数（只能调用）交替。"""
+    pool = [lambda x: x * 3, _inc, lambda x: x - 1, _double, lambda x: x % 1000003]
+    return [pool[i % len(pool)] for i in range(k)]
+
+
+def bench_fusion(n: int, stages: int, repeat: int = 3) -> dict[str, float]:
+    """对比逐级 map、预组合（不内联）与代码生成内联三种执行方式，返回各自最优秒数。"""
+    data = list(range(n))
+    funcs = _fusion_stages(stages)
+    variants = {
+        "unfused": lambda: _unfused(data, funcs),
+        "fused": lambda: list(map(compile_pipeline(funcs, codegen=False), data)),
+        "codegen": lambda: list(map(compile_pipeline(funcs, codegen=True), data)),
+    }
+    expected = _unfused(data[:1000], funcs)
+    best = {}
+    for name, run in variants.items():
+        assert run()[:1000] == expected, name
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        best[name] = min(times)
+    return best
+
+
+def bench_small(calls: int, size: int = 3, repeat: int = 3) -> dict[str, float]:
+    """短输入上每次调用的开销（微秒）：逐级 map vs apply_pipeline。
+
+    "fresh" 每次调用都传入新建的 lambda（如模块 `__main__` 示例），"reused"
+    复用同一组函数；两者都应与逐级 map 同一量级。
+    """
+    data = list(range(size))
+    funcs = [lambda x: x * 2, lambda x: x + 1]
+    variants = {
+        "unfused": lambda: _unfused(data, funcs),
+        "reused": lambda: apply_pipeline(data, funcs),
+        "fresh": lambda: apply_pipeline(data, [lambda x: x * 2, lambda x: x + 1]),
+        "codegen": lambda: apply_pipeline(data, funcs, codegen=True),
+    }
+    expected = _unfused(data, funcs)
+    best = {}
+    for name, run in variants.items():
+        assert run() == expected, name
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls):
+                run()
+            times.append(time.perf_counter() - start)
+        best[name] = min(times) / calls * 1e6
+    return best
+
+
+def _worker_stages(kind: str) -> list:
+    """并行基准的 CPU 密集函数链：模块级函数，或可按表达式源码传给子进程的 lambda。"""
+    if kind == "def":
+        return [_collatz_steps, _double]
+    return [lambda x: (x + 3) ** 200 % 1000003, lambda x: x * 2]
+
+
+def bench_workers(n: int, workers: int, kind: str = "def") -> float:
+    """CPU 密集函数链在 `workers` 个进程上的耗时（workers=1 为串行）。"""
+    funcs = _worker_stages(kind)
+    expected = [funcs[1](funcs[0](x)) for x in range(3)]
+    start = time.perf_counter()
+    out = apply_pipeline(range(n), funcs, workers=workers)
+    seconds = time.perf_counter() - start
+    assert len(out) == n and out[:3] == expected, "并行结果错误"
+    return seconds
+
+
+def bench_vectorized(n: int, repeat: int = 3) -> dict[str, float]:
+    """数值函数链：逐元素执行 vs 向量化阶段，返回各方式的最优秒数。
+
+    向量化阶段分别用 list 输入与 ndarray 输入测量。
+    """
+    scalar = [lambda x: x * 3, lambda x: x + 1, lambda x: x % 1000003, lambda x: x * x]
+    vector = [
+        vectorized(lambda a: a * 3),
+        vectorized(lambda a: a + 1),
+        vectorized(lambda a: a % 1000003),
+        vectorized(lambda a: a * a),
+    ]
+    data = list(range(n))
+    arr = np.arange(n, dtype=np.int64)
+    variants = {
+        "scalar": lambda: apply_pipeline(data, scalar),
+        "vector(list)": lambda: apply_pipeline(data, vector),
+        "vector(ndarray)": lambda: apply_pipeline(arr, vector),
+    }
+    expected = variants["scalar"]()
+    best = {}
+    for name, run in variants.items():
+        assert run() == expected, name
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        best[name] = min(times)
+    return best
+
+
+def bench_memory(mode: str, n: int) -> tuple[int, float]:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+        return ex.submit(_measure_memory, mode, n).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="functional benchmark")
+    parser.add_argument(
+        "--sizes", type=int, nargs="*", default=[10**5, 10**6, 10**7]
+    )
+    parser.add_argument(
+        "--stream-n", type=int, default=10**8, help="只跑流式版本的超大输入规模"
+    )
+    parser.add_argument(
+        "--fusion-n", type=int, default=10**6, help="阶段融合基准的输入规模，0 跳过"
+    )
+    parser.add_argument(
+        "--small-calls", type=int, default=10_000, help="短输入基准的调用次数，0 跳过"
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="*", default=[], help="并行扩展基准的进程数列表"
+    )
+    parser.add_argument("--workers-n", type=int, default=200_000)
+    parser.add_argument(
+        "--vector-n", type=int, default=10**6, help="向量化阶段基准的输入规模，0 跳过"
+    )
+    args = parser.parse_args()
+
+    if args.vector_n and np is not None:
+        print(f"== 向量化阶段: n={args.vector_n:,}，4 个算术阶段 ==")
+        best = bench_vectorized(args.vector_n)
+        base = best["scalar"]
+        for name, t in best.items():
+            print(f"{name:>16}: {t:7.3f}s  ({base / t:5.2f}x)")
+
+    if args.workers:
+        print(f"== 并行: n={args.workers_n:,}，本机 {os.cpu_count()} 核 ==")
+        for kind in ("def", "lambda"):
+            base = None
+            for w in args.workers:
+                seconds = bench_workers(args.workers_n, w, kind)
+                base = base or seconds
+                speedup = base / seconds
+                print(f"{kind:>6} workers={w:>2}: {seconds:7.2f}s  ({speedup:4.2f}x)")
+
+    if args.small_calls:
+        print(f"== 短输入: 3 个元素 × {args.small_calls:,} 次调用（微秒/次）==")
+        best = bench_small(args.small_calls)
+        base = best["unfused"]
+        for name, us in best.items():
+            print(f"{name:>10}: {us:8.2f}us  ({base / us:5.2f}x)")
+
+    if args.fusion_n:
+        print(f"== 阶段融合: n={args.fusion_n:,}（秒，越小越好）==")
+        for stages in (2, 5, 20):
+            best = bench_fusion(args.fusion_n, stages)
+            base = best["unfused"]
+            cells = "  ".join(
+                f"{name}={t:6.3f}s ({base / t:4.2f}x)" for name, t in best.items()
+            )
+            print(f"{stages:>2} 阶段: {cells}")
+
+    if args.sizes or args.stream_n:
+        print("== 内存: apply_pipeline(list) vs iter_pipeline(stream), 2 个阶段 ==")
+    for n in args.sizes:
+        for mode in ("list", "stream"):
+            extra, seconds = bench_memory(mode, n)
+            print(f"{mode:>6} n={n:>12,}: +{extra / 2**20:9.1f} MiB  {seconds:7.2f}s")
+    if args.stream_n:
+        extra, seconds = bench_memory("stream", args.stream_n)
+        n = args.stream_n
+        print(f"stream n={n:>12,}: +{extra / 2**20:9.1f} MiB  {seconds:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,1306 @@
-from collections.abc import Callable, Iterable
+import ast
+import asyncio
+import inspect
+import json
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+import types
+import weakref
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 
+try:  # NumPy 为可选依赖：没有安装时向量化阶段收到的是 list
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
 
-def apply_pipeline(seq: Iterable, funcs: list[Callable]):
-    """将若干函数依次作用于序列"""
-    result = list(seq)
+try:  # cloudpickle 为可选依赖：有它时任意 lambda/闭包都能交给进程池
+    import cloudpickle
+except ImportError:  # pragma: no cover - 取决于运行环境
+    cloudpickle = None
+
+# 每个函数能否内联的分析结果（内联表达式模板或 None），函数被回收后自动失效。
+_INLINE_CACHE: "weakref.WeakKeyDictionary[Callable, str | None]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# `compile_pipeline` 的结果缓存，键为 (tuple(funcs), codegen)，超过上限淘汰最久未用的。
+_FUSED_CACHE: "OrderedDict[tuple, Callable]" = OrderedDict()
+_FUSED_CACHE_SIZE = 128
+_FUSED_LOCK = threading.Lock()
+
+# 内联后表达式里会引入新作用域或绑定名字的节点，遇到就放弃内联。
+_SCOPED_NODES = (
+    ast.Lambda,
+    ast.ListComp,
+    ast.SetComp,
+    ast.DictComp,
+    ast.GeneratorExp,
+    ast.NamedExpr,
+    ast.Await,
+    ast.Yield,
+    ast.YieldFrom,
+)
+
+# 并行执行时每个分片的目标耗时（秒）与分片大小上下限，见 `_next_chunk_size`。
+TARGET_CHUNK_SECONDS = 0.05
+MIN_CHUNK_SIZE = 16
+MAX_CHUNK_SIZE = 1 << 16
+
+# 输入少于这么多个元素时不做融合，逐级 map（融合本身有编译开销）。
+FUSE_MIN_ITEMS = 1024
+
+# 含向量化阶段时每块的元素个数。
+DEFAULT_BLOCK_SIZE = 65536
+
+# 进程池子进程里由 `_init_worker` 编译好的分块执行函数。
+_worker_run: Callable | None = None
+
+
+def apply_pipeline(
+    seq: Iterable,
+    funcs: list[Callable],
+    workers: int | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    report: "PipelineReport | None" = None,
+    codegen: bool = False,
+):
+    """将若干函数依次作用于序列
+
+    函数链先经 `compile_pipeline` 融合成一个逐元素函数，每个元素只遍历一次；
+    结果与逐级 map 相同。`codegen=True` 时简单 lambda 进一步内联成表达式，
+    首次编译要读取并解析源码，只适合长输入或反复使用的同一组函数。输入已知
+    少于 `FUSE_MIN_ITEMS` 个元素时跳过融合，直接逐级 map。
+
+    函数链中含向量化阶段（`vectorized` 标记的函数或 NumPy ufunc）时，输入按
+    `block_size` 分块，连续的逐元素阶段融合后逐个执行，向量化阶段对整块数组
+    一次调用，在两者的边界处自动在 list 与 ndarray 之间转换（见 `_run_block`）。
+    批处理阶段（`batched`）同样按块执行，每个批处理阶段各自缓存凑不满一批的
+    剩余元素并带到下一块，因此除最后一批外每批都正好是 `size` 个。
+
+    workers 大于 1 时把输入切片后交给 `workers` 个进程并行执行（见
+    `_parallel_map`），结果保持输入顺序。简单 lambda（见 `_inline_expr`）以表达式
+    源码传给子进程；其余不可 pickle 的函数在装有 cloudpickle 时用它序列化，
+    否则退回线程池，此时受 GIL 限制，只对会释放 GIL 的阶段（I/O、C 扩展）有加速。
+
+    传入 `report=PipelineReport()` 时逐阶段记录耗时与分配（见 `PipelineReport`）；
+    不传时没有任何额外开销。
+    """
+    if workers is not None and workers <= 0:
+        raise ValueError("workers 必须为正整数")
+    if report is not None:
+        funcs = report.instrument(funcs)
+    if workers and workers > 1:
+        out = list(_parallel_map(seq, funcs, workers, codegen))
+    elif _is_short(seq) and not any(map(_is_block_stage, funcs)):
+        out = list(seq)
+        for f in funcs:
+            out = list(map(f, out))
+    else:
+        plan = _plan(funcs, codegen)
+        if all(kind == "scalar" for kind, _ in plan):
+            out = list(map(compile_pipeline(funcs, codegen), seq))
+        else:
+            runner = _BlockRunner(plan)
+            out = []
+            for block in _iter_blocks(seq, block_size):
+                out.extend(runner.feed(block))
+            out.extend(runner.flush())
+    if report is not None:
+        report.finish(len(out))
+    return out
+
+
+def iter_pipeline(
+    seq: Iterable,
+    funcs: list[Callable],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    report: "PipelineReport | None" = None,
+    codegen: bool = False,
+) -> Iterator:
+    """`apply_pipeline` 的惰性流式版本：接受任意可迭代对象，返回迭代器。
+
+    取出一个结果时元素才流经（融合后的）整条函数链，同一时刻只有一个元素在途，
+    内存占用与输入长度无关，第一个结果立即可得。含向量化阶段时改为逐块惰性：
+    同一时刻在途的是一块（`block_size` 个元素）。`report` 在迭代器耗尽时完成统计。
+
+    含批处理阶段时按其中最小的 `size` 读块，每个批处理阶段仍按自己的 `size`
+    攒批（见 `_BlockRunner`）；并在元素到达时检查 `max_wait`：某个阶段攒批中
+    最早的元素已等待超过其 max_wait 秒，就立即处理这不足一批的元素，上游产出
+    缓慢时结果不会被攒批无限推迟（同步迭代无法在两个元素之间超时，
+    真正的超时见 `apipeline`）。`codegen` 的含义同 `apply_pipeline`。
+
+    示例：
+    >>> it = iter_pipeline(range(10**12), [lambda x: x * 2, lambda x: x + 1])
+    >>> next(it), next(it)
+    (1, 3)
+    """
+    if report is not None:
+        funcs = report.instrument(funcs)
+    plan = _plan(funcs, codegen)
+    batches = [f for kind, f in plan if kind == "batch"]
+    if all(kind == "scalar" for kind, _ in plan):
+        it = map(compile_pipeline(funcs, codegen), seq)
+    elif batches:
+        size = min(block_size, *(b.size for b in batches))
+        waits = [b.max_wait for b in batches if b.max_wait is not None]
+        blocks = _iter_timed_blocks(seq, size, min(waits) if waits else None)
+        it = _run_blocks(_BlockRunner(plan, timed=bool(waits)), blocks)
+    else:
+        blocks = ((b, 0.0) for b in _iter_blocks(seq, block_size))
+        it = _run_blocks(_BlockRunner(plan), blocks)
+    if report is not None:
+        it = report._track(it)
+    return it
+
+
+class _VectorStage:
+    """`vectorized` 的标记包装：调用时把整块数组传给原函数。
+
+    elementwise 为块转不成一维数组时改用的逐元素函数；只有自动识别的 ufunc
+    有（见 `_run_vector`），显式 `vectorized` 的阶段为 None。
+    """
+
+    __slots__ = ("func", "elementwise")
+
+    def __init__(self, func: Callable, elementwise: Callable | None = None):
+        self.func = func
+        self.elementwise = elementwise
+
+    def __call__(self, block):
+        return self.func(block)
+
+    def __repr__(self) -> str:
+        return f"vectorized({self.func!r})"
+
+
+def vectorized(func: Callable) -> Callable:
+    """把 array -> array 的函数标记为向量化阶段，可作装饰器使用。
+
+    该阶段每次收到一整块输入（有 NumPy 时为 ndarray，否则为 list），须返回等长
+    的结果，长度不符时抛出 ValueError。NumPy ufunc（如 `np.sqrt`）无需标记，
+    会被自动识别；但若一块元素转不成一维数组（长度不一的序列、本身是数组或
+    序列的元素），ufunc 阶段对这一块退回逐元素调用，结果与 `map(ufunc, ...)`
+    相同。向量化阶段遵循 NumPy 的 dtype 语义：例如 int64 运算可能溢出回绕，
+    而逐元素的 Python int 不会。
+
+    NumPy 是可选依赖：没有安装时函数收到的是 list，须按 list 语义编写
+    （如 `[x * 2 for x in a]`）。依赖数组广播的写法在 list 上含义不同——
+    `a * 2` 会把列表重复一遍——此时长度检查会报错，而不会静默返回错误结果。
+
+    示例：
+    >>> apply_pipeline([1, 2, 3], [vectorized(lambda a: a * 2), lambda x: x + 1])
+    [3, 5, 7]
+    """
+    return _VectorStage(func)
+
+
+def _is_vector_stage(f: Callable) -> bool:
+    return isinstance(f, _VectorStage) or (np is not None and isinstance(f, np.ufunc))
+
+
+def _is_block_stage(f: Callable) -> bool:
+    return _is_vector_stage(f) or isinstance(f, _BatchStage)
+
+
+def _is_short(seq: Iterable) -> bool:
+    try:
+        return len(seq) < FUSE_MIN_ITEMS
+    except TypeError:  # 迭代器等长度未知的输入
+        return False
+
+
+class _BatchStage:
+    """`batched` 的标记包装：调用时把一批元素（list）传给原函数。"""
+
+    __slots__ = ("func", "size", "max_wait")
+
+    def __init__(self, func: Callable, size: int, max_wait: float | None):
+        self.func = func
+        self.size = size
+        self.max_wait = max_wait
+
+    def __call__(self, batch: list):
+        return self.func(batch)
+
+    def __repr__(self) -> str:
+        return f"batched({self.func!r}, size={self.size}, max_wait={self.max_wait})"
+
+
+def batched(
+    func: Callable | None = None, *, size: int = 64, max_wait: float | None = None
+):
+    """把 list -> list 的函数标记为批处理阶段，也可写成 `@batched(size=...)`。
+
+    运行时把元素按顺序每 `size` 个攒成一批调用一次 func，func 须返回等长的
+    list（或其他序列），结果再拆回逐个元素交给下一阶段。适合批量写库、批量
+    解析这类按批摊薄固定开销的操作。批可以跨越 `apply_pipeline` 的分块边界：
+    凑不满一批的剩余元素带到下一块，因此串行执行时只有最后一批可能不足 size
+    个。`workers=` 并行时每个分片独立攒批，分片大小按所有批处理阶段中最大的
+    size 取整（见 `_chunk_length`），只有该阶段的批在分片内保持完整，size 更小
+    的批处理阶段在分片末尾可能交出不满的一批。`max_wait`（秒）限制流式输入下
+    一批的最长攒批时间，见 `iter_pipeline` 与 `apipeline`。
+
+    示例：
+    >>> sizes = []
+    >>> def bulk(batch):
+    ...     sizes.append(len(batch))
+    ...     return [x * 10 for x in batch]
+    >>> apply_pipeline(range(5), [batched(bulk, size=2), str])
+    ['0', '10', '20', '30', '40']
+    >>> sizes
+    [2, 2, 1]
+    """
+    if size <= 0:
+        raise ValueError("size 必须为正整数")
+    if max_wait is not None and max_wait < 0:
+        raise ValueError("max_wait 不能为负数")
+    if func is None:
+        return partial(_BatchStage, size=size, max_wait=max_wait)
+    return _BatchStage(func, size, max_wait)
+
+
+def _check_vector(block, out):
+    try:
+        n = len(out)
+    except TypeError:  # 返回了标量
+        n = None
+    if n != len(block):
+        raise ValueError(f"向量化阶段返回 {n} 个结果，输入为 {len(block)} 个")
+    return out
+
+
+def _run_vector(f: _VectorStage, block):
+    """执行一个向量化阶段；ufunc 遇到转不成一维数组的块时逐元素调用。"""
+    if np is not None and not isinstance(block, np.ndarray):
+        try:
+            arr = np.asarray(block)
+        except ValueError:  # 长度不一的序列等，无法组成规则数组
+            if f.elementwise is None:
+                raise
+            return list(map(f.elementwise, block))
+    else:
+        arr = block
+    if f.elementwise is not None and arr.ndim != 1:
+        return list(map(f.elementwise, block))
+    return _check_vector(arr, f(arr))
+
+
+def _check_batch(batch: list, out) -> list:
+    out = list(out)
+    if len(out) != len(batch):
+        raise ValueError(f"批处理阶段返回 {len(out)} 个结果，输入为 {len(batch)} 个")
+    return out
+
+
+def _plan(funcs: list[Callable], codegen: bool = False) -> list[tuple[str, Callable]]:
+    """把函数链切成段：连续的逐元素阶段融合为一段，每个向量化/批处理阶段单独一段。
+
+    返回 [(类型, 可调用对象), ...]，类型为 "scalar"、"vector" 或 "batch"。
+    """
+    plan: list[tuple[str, Callable]] = []
+    run: list[Callable] = []
     for f in funcs:
-        result = list(map(f, result))
-    return result
+        if _is_vector_stage(f):
+            kind = "vector"
+            if not isinstance(f, _VectorStage):  # 自动识别的 ufunc
+                f = _VectorStage(f, elementwise=f)
+        elif isinstance(f, _BatchStage):
+            kind = "batch"
+        else:
+            run.append(f)
+            continue
+        if run:
+            plan.append(("scalar", compile_pipeline(run, codegen)))
+            run = []
+        plan.append((kind, f))
+    if run:
+        plan.append(("scalar", compile_pipeline(run, codegen)))
+    return plan
+
+
+def _iter_blocks(seq: Iterable, block_size: int) -> Iterator:
+    """按 block_size 切块；ndarray 输入直接切片（视图，不复制），其余为 list。"""
+    if block_size <= 0:
+        raise ValueError("block_size 必须为正整数")
+    if np is not None and isinstance(seq, np.ndarray):
+        for start in range(0, len(seq), block_size):
+            yield seq[start : start + block_size]
+        return
+    it = iter(seq)
+    while block := list(islice(it, block_size)):
+        yield block
+
+
+def _iter_timed_blocks(
+    seq: Iterable, block_size: int, max_wait: float | None
+) -> Iterator[tuple[list, float]]:
+    """按 block_size 切块，产出 (块, 块内第一个元素的到达时刻)。
+
+    给定 max_wait 时还在每个元素到达时检查当前块是否已等待超过 max_wait 秒，
+    超过就提前交出这一块。
+    """
+    block: list = []
+    arrived = 0.0
+    for x in seq:
+        if not block:
+            arrived = time.monotonic()
+        block.append(x)
+        if len(block) >= block_size or (
+            max_wait is not None and time.monotonic() - arrived >= max_wait
+        ):
+            yield block, arrived
+            block = []
+    if block:
+        yield block, arrived
+
+
+class _BlockRunner:
+    """按 `_plan` 的分段逐块处理输入，批处理阶段的剩余元素跨块保留。
+
+    - 进入向量化段前转成 ndarray，进入逐元素段与批处理段前用 `tolist()` 转回
+      Python 对象，相邻的向量化阶段之间数组直接传递，不做转换；
+    - 每个批处理阶段有自己的缓冲：只把攒满 `size` 的批交给函数，剩余元素留到
+      下一块，`flush` 时再处理最后不足一批的部分，因此一块的输出可能短于输入，
+      缺的元素会在之后的块或 `flush` 中按原顺序补齐；
+    - `timed=True` 时（流式输入）若某阶段缓冲中最早的元素已等待超过该阶段的
+      `max_wait`，收到新元素时就连同不足一批的部分一起处理。
+    """
+
+    def __init__(self, plan: list[tuple[str, Callable]], timed: bool = False):
+        self.plan = plan
+        self.timed = timed
+        self._carry: list[list] = [[] for _ in plan]
+        self._since = [0.0] * len(plan)
+
+    def feed(self, block, arrived: float = 0.0) -> list:
+        """处理一块输入（arrived 为块内第一个元素的到达时刻），返回已完成的结果。"""
+        return self._run(block, arrived, final=False)
+
+    def flush(self) -> list:
+        """输入结束：处理所有缓冲中不足一批的元素，返回剩余结果。"""
+        return self._run([], time.monotonic(), final=True)
+
+    def _run(self, block, arrived: float, final: bool) -> list:
+        for k, (kind, f) in enumerate(self.plan):
+            if kind == "vector":
+                if len(block):
+                    block = _run_vector(f, block)
+                continue
+            if np is not None and isinstance(block, np.ndarray):
+                block = block.tolist()
+            if kind == "batch":
+                block = self._run_batches(k, f, block, arrived, final)
+            else:
+                block = list(map(f, block))
+        if np is not None and isinstance(block, np.ndarray):
+            return block.tolist()
+        return list(block)
+
+    def _run_batches(
+        self, k: int, f: "_BatchStage", block: list, arrived: float, final: bool
+    ) -> list:
+        carry = self._carry[k]
+        if not carry:
+            self._since[k] = arrived
+        pending = carry + block if carry else block
+        ready = len(pending)
+        if not final:
+            ready -= ready % f.size
+            if (
+                self.timed
+                and ready < len(pending)
+                and f.max_wait is not None
+                and time.monotonic() - self._since[k] >= f.max_wait
+            ):
+                ready = len(pending)
+        out: list = []
+        for start in range(0, ready, f.size):
+            batch = pending[start : min(start + f.size, ready)]
+            out.extend(_check_batch(batch, f(batch)))
+        self._carry[k] = pending[ready:]
+        if ready and self._carry[k]:
+            self._since[k] = arrived
+        return out
+
+
+def _run_blocks(runner: _BlockRunner, blocks: Iterable) -> Iterator:
+    for block, arrived in blocks:
+        yield from runner.feed(block, arrived)
+    yield from runner.flush()
+
+
+def _run_block(plan: list[tuple[str, Callable]], block) -> list:
+    """一次性处理一整块（并行执行的单个分片），批处理阶段的最后一批可不足 size。"""
+    runner = _BlockRunner(plan)
+    return runner.feed(block) + runner.flush()
+
+
+class _Rename(ast.NodeTransformer):
+    def __init__(self, old: str, new: str):
+        self.old, self.new = old, new
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id == self.old:
+            return ast.copy_location(ast.Name(id=self.new, ctx=node.ctx), node)
+        return node
+
+
+def _iter_lambdas(source: str) -> Iterator[ast.Lambda]:
+    """从源码片段中找出所有 lambda 节点。
+
+    `inspect.getsource` 对 lambda 返回的是所在的整行，可能只是某个语句的一部分
+    （例如多行列表中的一项）而无法整体解析；此时从每个 `lambda` 关键字起，
+    截到最长的能单独解析的表达式。
+    """
+    try:
+        tree = ast.parse(source.strip())
+    except SyntaxError:
+        pass
+    else:
+        yield from (n for n in ast.walk(tree) if isinstance(n, ast.Lambda))
+        return
+    for m in re.finditer(r"\blambda\b", source):
+        for end in range(len(source), m.start(), -1):
+            try:
+                expr = ast.parse(source[m.start() : end].strip(), mode="eval")
+            except SyntaxError:
+                continue
+            yield from (n for n in ast.walk(expr) if isinstance(n, ast.Lambda))
+            break
+
+
+def _inline_expr(f: Callable) -> str | None:
+    """若 f 是可以内联的简单 lambda，返回其函数体表达式（参数名换成 `_v`）。
+
+    条件：单个位置参数、无默认值/闭包变量，且函数体不读取任何全局名或属性
+    （`co_names` 为空，例如 `lambda x: x * 2 + 1`），这样内联后的求值结果
+    与调用原函数完全相同。源码取不到或匹配不上时返回 None，退回普通调用。
+    """
+    if not isinstance(f, types.FunctionType) or f.__name__ != "<lambda>":
+        return None
+    code = f.__code__
+    if (
+        code.co_argcount != 1
+        or code.co_posonlyargcount
+        or code.co_kwonlyargcount
+        or code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS)
+        or code.co_freevars
+        or code.co_names
+        or f.__defaults__
+    ):
+        return None
+    try:
+        source = inspect.getsource(f)
+    except (OSError, TypeError):
+        return None
+
+    # 同一行可能有多个 lambda：逐个编译，按字节码与常量（区分类型，见 `_const_key`）
+    # 找到 f 对应的那一个；匹配到多个展开结果不同的 lambda 时无法确定，放弃内联。
+    want = _const_key(code.co_consts)
+    found: set[str] = set()
+    for node in _iter_lambdas(source):
+        compiled = compile(ast.Expression(body=node), "<lambda>", "eval")
+        inner = next(
+            (c for c in compiled.co_consts if isinstance(c, types.CodeType)), None
+        )
+        if (
+            inner is None
+            or inner.co_code != code.co_code
+            or inner.co_varnames != code.co_varnames
+            or _const_key(inner.co_consts) != want
+        ):
+            continue
+        if any(isinstance(n, _SCOPED_NODES) for n in ast.walk(node.body)):
+            return None
+        body = _Rename(node.args.args[0].arg, "_v").visit(node.body)
+        found.add(f"({ast.unparse(body)})")
+    return found.pop() if len(found) == 1 else None
+
+
+def _const_key(const):
+    """常量的比较键：`1`、`1.0`、`True` 相等但不能互换，`0.0` 与 `-0.0` 同理，
+    因此连同类型一起比较，浮点数与复数按 repr 比较。"""
+    if isinstance(const, (tuple, frozenset)):
+        return type(const), tuple(map(_const_key, const))
+    if isinstance(const, (float, complex)):
+        return type(const), repr(const)
+    return type(const), const
+
+
+def compile_pipeline(funcs: list[Callable], codegen: bool = False) -> Callable:
+    """把函数链预先融合成一个逐元素调用的函数 `fused(x) == fk(...f1(f0(x)))`。
+
+    - 生成一段直线代码 `_v = _f0(_v); _v = _f1(_v); ...`，每个元素只进入一个 Python
+      帧，省去逐级 map 的迭代与中间列表；
+    - `codegen=True` 时，简单的 lambda（见 `_inline_expr`）直接展开成表达式，
+      连函数调用也省掉；
+    - 结果按 (函数链, codegen) 缓存（最多 `_FUSED_CACHE_SIZE` 组），同一组函数
+      再次融合时不重新编译；
+    - 没有函数时返回恒等函数，只有一个函数时直接返回它。
+
+    示例：
+    >>> fused = compile_pipeline([lambda x: x * 2, abs], codegen=True)
+    >>> fused(-3)
+    6
+    """
+    funcs = list(funcs)
+    if not funcs:
+        return lambda x: x
+    if len(funcs) == 1:
+        return funcs[0]
+    key = (tuple(funcs), codegen)
+    try:
+        with _FUSED_LOCK:
+            fused = _FUSED_CACHE.get(key)
+            if fused is not None:
+                _FUSED_CACHE.move_to_end(key)
+                return fused
+    except TypeError:  # 不可哈希的可调用对象
+        return _fuse(funcs, codegen)
+    fused = _fuse(funcs, codegen)
+    with _FUSED_LOCK:
+        _FUSED_CACHE[key] = fused
+        if len(_FUSED_CACHE) > _FUSED_CACHE_SIZE:
+            _FUSED_CACHE.popitem(last=False)
+    return fused
+
+
+def _fuse(funcs: list[Callable], codegen: bool) -> Callable:
+    """生成并编译 `compile_pipeline` 的融合函数。"""
+
+    namespace: dict = {}
+    lines = ["def fused(_v):"]
+    for i, f in enumerate(funcs):
+        expr = None
+        if codegen and isinstance(f, _ExprStage):
+            expr = f"({f.expr})"
+        elif codegen:
+            try:
+                expr = _INLINE_CACHE[f]
+            except (KeyError, TypeError):
+                expr = _inline_expr(f)
+                try:
+                    _INLINE_CACHE[f] = expr
+                except TypeError:  # 不支持弱引用的可调用对象
+                    pass
+        if expr is None:
+            namespace[f"_f{i}"] = f
+            expr = f"_f{i}(_v)"
+        lines.append(f"    _v = {expr}")
+    lines.append("    return _v")
+    exec(compile("\n".join(lines), "<fused pipeline>", "exec"), namespace)
+    return namespace["fused"]
+
+
+class _ExprStage:
+    """可 pickle 的简单 lambda，只携带 `_inline_expr` 得到的表达式源码。
+
+    表达式的参数名为 `_v`，在子进程中重新编译；`compile_pipeline` 会直接把它内联。
+    """
+
+    __slots__ = ("expr", "_func")
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        self._func = eval(f"lambda _v: {expr}", {})
+
+    def __call__(self, x):
+        return self._func(x)
+
+    def __reduce__(self):
+        return (_ExprStage, (self.expr,))
+
+    def __repr__(self) -> str:
+        return f"<lambda: {self.expr}>"
+
+
+def _portable_stage(f: Callable) -> Callable | None:
+    """返回可用标准 pickle 传给子进程的等价阶段，做不到时返回 None。"""
+    if isinstance(f, (_VectorStage, _BatchStage)):
+        inner = _portable_stage(f.func)
+        if inner is None:
+            return None
+        if isinstance(f, _VectorStage):
+            return _VectorStage(inner)
+        return _BatchStage(inner, f.size, f.max_wait)
+    if _picklable(f):
+        return f
+    expr = _inline_expr(f)
+    return None if expr is None else _ExprStage(expr)
+
+
+def _worker_payload(funcs: list[Callable]) -> list[Callable] | bytes | None:
+    """进程池初始化参数：可移植的函数链或 cloudpickle 序列化的字节，都不行时为 None。"""
+    stages = [_portable_stage(f) for f in funcs]
+    if None not in stages:
+        return stages
+    if cloudpickle is not None:
+        try:
+            return cloudpickle.dumps(funcs)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            pass
+    return None
+
+
+def _init_worker(funcs: list[Callable] | bytes, codegen: bool = False) -> None:
+    """进程池初始化：函数链只随初始化参数传给每个子进程一次，在子进程里编译。"""
+    global _worker_run
+    if isinstance(funcs, bytes):
+        funcs = pickle.loads(funcs)
+    _worker_run = partial(_run_block, _plan(funcs, codegen))
+
+
+def _timed_run(run: Callable, chunk: list) -> tuple[list, float]:
+    start = time.perf_counter()
+    out = run(chunk)
+    return out, time.perf_counter() - start
+
+
+def _run_chunk(chunk: list) -> tuple[list, float]:
+    return _timed_run(_worker_run, chunk)
+
+
+def _picklable(obj) -> bool:
+    try:
+        pickle.dumps(obj)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def _next_chunk_size(size: int, count: int, seconds: float) -> int:
+    """根据上一片（count 个元素耗时 seconds）估算下一片的大小。
+
+    目标是每片耗时接近 `TARGET_CHUNK_SECONDS`：元素越便宜片越大，摊薄进程间
+    通信开销；元素越贵片越小，各进程负载更均衡。每次最多放大或缩小 4 倍，
+    避免单次计时抖动，结果限制在 [MIN_CHUNK_SIZE, MAX_CHUNK_SIZE]。
+    """
+    if seconds <= 0 or count <= 0:
+        target = size * 4
+    else:
+        target = int(TARGET_CHUNK_SECONDS * count / seconds)
+    target = max(size // 4, min(size * 4, target))
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, target))
+
+
+def _chunk_length(size: int, unit: int) -> int:
+    """分片实际读取的元素数：size 向上取整为 unit 的倍数，不超过 MAX_CHUNK_SIZE。
+
+    unit 为最大的批大小，该阶段的批在分片内都是完整的；其余批处理阶段的
+    size 不一定整除 unit，分片末尾可能有一批不满（`_run_block` 照常处理）。
+    unit 本身超过 MAX_CHUNK_SIZE 时每片恰好一批。
+    """
+    return min(-(-size // unit) * unit, max(unit, MAX_CHUNK_SIZE // unit * unit))
+
+
+def _parallel_map(
+    seq: Iterable, funcs: list[Callable], workers: int, codegen: bool = False
+) -> Iterator:
+    """按自适应大小的分片并行执行函数链（每片经 `_run_block`），按输入顺序逐个产出。
+
+    - 能传给子进程的函数链（见 `_worker_payload`）用进程池，经 `_init_worker`
+      在每个子进程编译一次，之后每个任务只传输分片数据；否则退回线程池，
+      直接共享融合函数；
+    - 同时在途的分片最多 `2 * workers` 个，按提交顺序取回，内存占用有界；
+    - 每取回一片就用它在子进程中的耗时调整后续分片大小；含批处理阶段时分片
+      大小向上取整为最大的 `size` 的倍数（见 `_chunk_length`）。
+    """
+    payload = _worker_payload(funcs)
+    if payload is not None:
+        ex = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(payload, codegen)
+        )
+        task = _run_chunk
+    else:
+        ex = ThreadPoolExecutor(max_workers=workers)
+        task = partial(_timed_run, partial(_run_block, _plan(funcs, codegen)))
+
+    unit = max((f.size for kind, f in _plan(funcs) if kind == "batch"), default=1)
+    it = iter(seq)
+    size = MIN_CHUNK_SIZE
+    with ex:
+        in_flight: deque[Future] = deque()
+        while True:
+            chunk = list(islice(it, _chunk_length(size, unit)))
+            if chunk:
+                in_flight.append(ex.submit(task, chunk))
+            if in_flight and (not chunk or len(in_flight) >= 2 * workers):
+                out, seconds = in_flight.popleft().result()
+                size = _next_chunk_size(size, len(out), seconds)
+                yield from out
+            elif not chunk:
+                return
+
+
+class _TypedKey(list):
+    """缓存键 (type(x), x)，哈希值只在构造时计算一次（参照 functools._HashedSeq）。
+
+    x 不可哈希时构造抛出 TypeError。
+    """
+
+    __slots__ = ("hashvalue",)
+
+    def __init__(self, x):
+        self[:] = (type(x), x)
+        self.hashvalue = hash((type(x), x))
+
+    def __hash__(self) -> int:
+        return self.hashvalue
+
+
+class CachedStage:
+    """为一个纯函数阶段加上独立的有界 LRU 缓存（可选 TTL），由 `cached` 创建。
+
+    - 以 (参数类型, 参数) 为键，与 `lru_cache(typed=True)` 相同，`1`、`True`、
+      `1.0` 不会互相命中；参数不可哈希时直接调用原函数、不缓存；
+    - 条目数超过 `maxsize` 时淘汰最久未使用的条目；设置 `ttl`（秒）后，
+      过期条目在下次访问时视为未命中并重新计算；
+    - 原函数抛出的异常不缓存，照常向上传播；
+    - 记录命中/未命中次数与未命中时的计算耗时，据此估算节省的时间
+      （命中次数 × 平均单次计算耗时），见 `stats` 与 `cache_stats`；
+    - 内部用一把锁保护字典与计数器，原函数在锁外执行，可用于线程池；
+      含锁的对象不可 pickle，因此 `apply_pipeline(..., workers=N)` 会退回线程池，
+      各线程共享同一份缓存。
+
+    示例：
+    >>> square = cached(lambda x: x * x, maxsize=2)
+    >>> apply_pipeline([3, 3, 4, 3], [square])
+    [9, 9, 16, 9]
+    >>> square.stats()["hits"]
+    2
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        maxsize: int = 1024,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize 必须为正整数")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl 必须为正数")
+        self.func = func
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()  # 键 -> (结果, 过期时刻)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._miss_seconds = 0.0
+
+    def __call__(self, x):
+        try:
+            key = _TypedKey(x)
+        except TypeError:
+            return self.func(x)
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if self.ttl is None or entry[1] > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+
+        start = time.perf_counter()
+        result = self.func(x)
+        elapsed = time.perf_counter() - start
+        expires = self._clock() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._miss_seconds += elapsed
+            self._data[key] = (result, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def __repr__(self) -> str:
+        return f"cached({self.func!r}, maxsize={self.maxsize}, ttl={self.ttl})"
+
+    def stats(self) -> dict:
+        """返回命中/未命中/淘汰/过期次数、命中率、当前条目数与估算节省的秒数。"""
+        with self._lock:
+            total = self.hits + self.misses
+            avg = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "miss_seconds": self._miss_seconds,
+                "saved_seconds": self.hits * avg,
+            }
+
+    def clear(self) -> None:
+        """清空缓存条目与计数器。"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+            self._miss_seconds = 0.0
+
+
+def cached(
+    func: Callable | None = None, *, maxsize: int = 1024, ttl: float | None = None
+):
+    """把阶段标记为可缓存，返回 `CachedStage`。
+
+    也可作装饰器使用：`@cached(maxsize=..., ttl=...)`。
+    """
+    if func is None:
+        return partial(CachedStage, maxsize=maxsize, ttl=ttl)
+    return CachedStage(func, maxsize=maxsize, ttl=ttl)
+
+
+def cache_stats(funcs: list[Callable]) -> dict[str, dict]:
+    """汇总函数链中所有缓存阶段的 `stats()`，键为 "序号:函数名"。
+
+    示例：
+    >>> funcs = [cached(abs), str]
+    >>> _ = apply_pipeline([-1, -1, -1], funcs)
+    >>> cache_stats(funcs)["0:abs"]["hit_rate"]
+    0.6666666666666666
+    """
+    return {
+        f"{i}:{_stage_name(f)}": f.stats()
+        for i, f in enumerate(funcs)
+        if isinstance(f, CachedStage)
+    }
+
+
+class StageStats:
+    """单个阶段的运行统计，由 `PipelineReport` 创建并更新。
+
+    延迟分位数基于最多 `PipelineReport.sample_size` 个调用的蓄水池抽样，
+    内存不随输入长度增长；分配增量是每次调用前后 `sys.getallocatedblocks()`
+    之差的累计，即该阶段留存下来的内存块数（可为负）。
+    """
+
+    def __init__(self, name: str, sample_size: int):
+        self.name = name
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+        self.alloc_blocks = 0
+        self._samples: list[float] = []
+        self._sample_size = sample_size
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, items: int, blocks: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            self.seconds += seconds
+            self.alloc_blocks += blocks
+            if len(self._samples) < self._sample_size:
+                self._samples.append(seconds)
+            else:
+                j = self._rng.randrange(self.calls)
+                if j < self._sample_size:
+                    self._samples[j] = seconds
+
+    def percentile(self, q: float) -> float:
+        """第 q 分位（0~1）的单次调用耗时（秒），没有调用时为 0。"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "items": self.items,
+            "total_seconds": self.seconds,
+            "p50_seconds": self.percentile(0.50),
+            "p99_seconds": self.percentile(0.99),
+            "items_per_second": self.items / self.seconds if self.seconds else 0.0,
+            "alloc_blocks": self.alloc_blocks,
+        }
+
+
+class _ProfiledStage:
+    """计时包装：记录原阶段每次调用的耗时、处理的元素数与分配增量。"""
+
+    __slots__ = ("func", "stats", "per_block")
+
+    def __init__(self, func: Callable, stats: StageStats, per_block: bool):
+        self.func = func
+        self.stats = stats
+        self.per_block = per_block
+
+    def __call__(self, x):
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        out = self.func(x)
+        elapsed = time.perf_counter() - start
+        self.stats.record(
+            elapsed,
+            len(out) if self.per_block else 1,
+            sys.getallocatedblocks() - blocks,
+        )
+        return out
+
+    def __reduce__(self):
+        # 统计只在本进程内汇总，禁止 pickle，使 workers= 退回线程池。
+        raise TypeError("_ProfiledStage 不可 pickle")
+
+
+def _stage_name(f: Callable) -> str:
+    while isinstance(f, (_VectorStage, _BatchStage, CachedStage)):
+        f = f.func
+    return getattr(f, "__name__", None) or repr(f)
+
+
+class PipelineReport:
+    """管道运行的逐阶段性能报告：传给 `apply_pipeline(..., report=...)` 启用。
+
+    每个阶段记录调用次数、处理元素数、累计耗时、p50/p99 单次耗时、吞吐量
+    （元素/秒，按该阶段自身耗时计算）与分配增量，另记录整次运行的墙钟时间。
+    计时包装会让融合后的函数链不再内联 lambda，且每次调用多两次计时，
+    因此只在需要定位瓶颈时启用。同一个报告再次使用时会清空之前的记录。
+
+    示例：
+    >>> report = PipelineReport()
+    >>> apply_pipeline(range(3), [abs, str], report=report)
+    ['0', '1', '2']
+    >>> [(s["name"], s["calls"]) for s in report.to_dict()["stages"]]
+    [('0:abs', 3), ('1:str', 3)]
+    """
+
+    def __init__(self, sample_size: int = 4096):
+        if sample_size <= 0:
+            raise ValueError("sample_size 必须为正整数")
+        self.sample_size = sample_size
+        self.stages: list[StageStats] = []
+        self.items = 0
+        self.wall_seconds = 0.0
+        self._start = 0.0
+
+    def instrument(self, funcs: list[Callable]) -> list[Callable]:
+        """开始一次新的记录，返回包装了计时的函数链（保留向量化标记）。"""
+        self.stages = []
+        self.items = 0
+        self.wall_seconds = 0.0
+        wrapped: list[Callable] = []
+        for i, f in enumerate(funcs):
+            stats = StageStats(f"{i}:{_stage_name(f)}", self.sample_size)
+            self.stages.append(stats)
+            if isinstance(f, _VectorStage):
+                wrapped.append(_VectorStage(_ProfiledStage(f, stats, per_block=True)))
+            elif _is_vector_stage(f):  # ufunc：逐元素退回时按单个元素计时
+                wrapped.append(
+                    _VectorStage(
+                        _ProfiledStage(f, stats, per_block=True),
+                        elementwise=_ProfiledStage(f, stats, per_block=False),
+                    )
+                )
+            elif isinstance(f, _BatchStage):
+                profiled = _ProfiledStage(f, stats, per_block=True)
+                wrapped.append(_BatchStage(profiled, f.size, f.max_wait))
+            else:
+                wrapped.append(_ProfiledStage(f, stats, per_block=False))
+        self._start = time.perf_counter()
+        return wrapped
+
+    def finish(self, items: int) -> None:
+        """记录输出元素数与墙钟时间，由管道在运行结束时调用。"""
+        self.items = items
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def _track(self, it: Iterator) -> Iterator:
+        count = 0
+        for x in it:
+            count += 1
+            yield x
+        self.finish(count)
+
+    def to_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "wall_seconds": self.wall_seconds,
+            "items_per_second": (
+                self.items / self.wall_seconds if self.wall_seconds else 0.0
+            ),
+            "stages": [stats.to_dict() for stats in self.stages],
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'stage':<20}{'calls':>10}{'total(s)':>10}"
+            f"{'p50(us)':>10}{'p99(us)':>10}{'items/s':>12}{'blocks':>8}"
+        ]
+        for st in map(StageStats.to_dict, self.stages):
+            lines.append(
+                f"{st['name'][:20]:<20}{st['calls']:>10}{st['total_seconds']:>10.3f}"
+                f"{st['p50_seconds'] * 1e6:>10.1f}{st['p99_seconds'] * 1e6:>10.1f}"
+                f"{st['items_per_second']:>12.0f}{st['alloc_blocks']:>8}"
+            )
+        lines.append(f"{self.items} items in {self.wall_seconds:.3f}s")
+        return "\n".join(lines)
+
+
+class _Raised:
+    """异步管道中阶段或数据源抛出的异常，随输出队列交给消费者重新抛出。"""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_DONE = object()
+
+
+class AsyncStage:
+    """`apipeline` 的一个阶段：函数加上该阶段自己的并发上限与输入队列容量。
+
+    - func 可以是普通函数，也可以是 `async def` 协程函数
+      （或返回 awaitable 的可调用对象）；
+    - concurrency：同时处理的元素个数上限，即该阶段的 worker 协程数；
+    - queue_size：该阶段输入队列的容量，None 表示沿用 `apipeline` 的 queue_size；
+      队列满时上游阶段在 put 处等待，形成逐级背压；
+    - threaded：为 True 时同步函数经 `asyncio.to_thread` 在线程中执行，
+      适合阻塞 I/O；默认直接在事件循环里调用，适合轻量的转换。
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        concurrency: int = 1,
+        queue_size: int | None = None,
+        threaded: bool = False,
+    ):
+        if concurrency <= 0:
+            raise ValueError("concurrency 必须为正整数")
+        if queue_size is not None and queue_size <= 0:
+            raise ValueError("queue_size 必须为正整数")
+        self.func = func
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.threaded = threaded
+
+    async def __call__(self, x):
+        if self.threaded:
+            return await asyncio.to_thread(self.func, x)
+        out = self.func(x)
+        if inspect.isawaitable(out):
+            out = await out
+        return out
+
+    def __repr__(self) -> str:
+        return f"astage({self.func!r}, concurrency={self.concurrency})"
+
+
+def astage(
+    func: Callable,
+    *,
+    concurrency: int = 1,
+    queue_size: int | None = None,
+    threaded: bool = False,
+) -> AsyncStage:
+    """创建 `AsyncStage`，参数含义见该类。"""
+    return AsyncStage(func, concurrency, queue_size, threaded)
+
+
+async def _aiter_source(source: Iterable | AsyncIterable) -> AsyncIterator:
+    if isinstance(source, AsyncIterable):
+        async for x in source:
+            yield x
+    else:
+        for x in source:
+            yield x
+
+
+# 保序模式下无 max_wait 的批处理阶段检查读取窗口是否耗尽的间隔（秒）。
+_STARVED_POLL = 0.05
+
+
+async def _collect_batch(
+    in_q: asyncio.Queue, spec: _BatchStage, window: asyncio.Semaphore | None
+) -> tuple[list, bool]:
+    """从队列攒一批 (序号, 元素)，返回 (批, 是否遇到结束标记)。
+
+    攒满 `spec.size` 个、距第一个元素到达超过 `spec.max_wait` 秒、或遇到结束
+    标记时返回。保序模式下若读取窗口已耗尽（更早的元素尚未产出，数据源暂停），
+    等下去也不会有新元素，此时提前交出不足一批的元素，避免死锁。
+    """
+    loop = asyncio.get_running_loop()
+    first = await in_q.get()
+    if first is _DONE:
+        return [], True
+    batch = [first]
+    deadline = None if spec.max_wait is None else loop.time() + spec.max_wait
+    while len(batch) < spec.size:
+        timeout = _STARVED_POLL if window is not None else None
+        if deadline is not None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            item = await asyncio.wait_for(in_q.get(), timeout)
+        except TimeoutError:
+            if window is not None and window.locked() and in_q.empty():
+                break
+            continue
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+async def apipeline(
+    source: Iterable | AsyncIterable,
+    stages: list[Callable],
+    *,
+    ordered: bool = False,
+    queue_size: int = 64,
+) -> AsyncIterator:
+    """异步管道：各阶段由各自的 worker 协程并发执行，用有界队列首尾相连。
+
+    - stages 中可以混用普通函数、`async def` 函数与 `astage(...)`；
+      未包装的函数视为 `astage(f)`，即并发数 1；
+    - `batched(f, size, max_wait)` 阶段由 worker 攒批后调用，`max_wait` 为从批中
+      第一个元素到达起的真实超时，到时即使不足 size 个也立即处理；
+    - source 可以是同步或异步可迭代对象；
+    - 默认按完成先后产出结果；`ordered=True` 时按输入顺序产出。保序时先完成的
+      结果在内部暂存，已读入但尚未产出的元素总数不超过各队列容量与并发数之和，
+      慢元素会让数据源暂停读取，内存依然有界；
+    - 任一阶段或数据源抛出异常时，消费者一侧重新抛出该异常并取消所有 worker；
+      提前停止迭代（break / aclose）同样会取消它们。
+
+    示例：
+    >>> async def fetch(x):
+    ...     await asyncio.sleep(0.01 * (3 - x))
+    ...     return x * 10
+    >>> async def main():
+    ...     stages = [astage(fetch, concurrency=3), str]
+    ...     return [y async for y in apipeline(range(3), stages, ordered=True)]
+    >>> asyncio.run(main())
+    ['0', '10', '20']
+    """
+    if queue_size <= 0:
+        raise ValueError("queue_size 必须为正整数")
+    stages = [s if isinstance(s, AsyncStage) else AsyncStage(s) for s in stages]
+    queues = [asyncio.Queue(maxsize=s.queue_size or queue_size) for s in stages]
+    out_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    queues.append(out_q)
+    window = None
+    if ordered:
+        capacity = sum(q.maxsize for q in queues) + sum(
+            s.concurrency * (s.func.size if isinstance(s.func, _BatchStage) else 1)
+            for s in stages
+        )
+        window = asyncio.Semaphore(capacity)
+
+    async def feed() -> None:
+        try:
+            i = 0
+            async for x in _aiter_source(source):
+                if window is not None:
+                    await window.acquire()
+                await queues[0].put((i, x))
+                i += 1
+        except Exception as exc:
+            await out_q.put(_Raised(exc))
+            return
+        await queues[0].put(_DONE)
+
+    async def finish(k: int, alive: list[int]) -> None:
+        # 放回结束标记让同阶段的其他 worker 也能看到；最后一个退出的
+        # worker 把结束标记传给下一阶段。
+        queues[k].put_nowait(_DONE)
+        alive[0] -= 1
+        if alive[0] == 0:
+            await queues[k + 1].put(_DONE)
+
+    async def work(k: int, alive: list[int]) -> None:
+        stage, in_q, next_q = stages[k], queues[k], queues[k + 1]
+        while True:
+            item = await in_q.get()
+            if item is _DONE:
+                await finish(k, alive)
+                return
+            i, x = item
+            try:
+                y = await stage(x)
+            except Exception as exc:
+                await out_q.put(_Raised(exc))
+                return
+            await next_q.put((i, y))
+
+    async def work_batches(k: int, alive: list[int]) -> None:
+        stage, in_q, next_q = stages[k], queues[k], queues[k + 1]
+        done = False
+        while not done:
+            batch, done = await _collect_batch(in_q, stage.func, window)
+            if batch:
+                values = [x for _, x in batch]
+                try:
+                    out = _check_batch(values, await stage(values))
+                except Exception as exc:
+                    await out_q.put(_Raised(exc))
+                    return
+                for (i, _), y in zip(batch, out, strict=True):
+                    await next_q.put((i, y))
+        await finish(k, alive)
+
+    tasks = [asyncio.create_task(feed())]
+    for k, stage in enumerate(stages):
+        alive = [stage.concurrency]
+        worker = work_batches if isinstance(stage.func, _BatchStage) else work
+        tasks.extend(
+            asyncio.create_task(worker(k, alive)) for _ in range(stage.concurrency)
+        )
+
+    try:
+        pending: dict[int, object] = {}
+        next_index = 0
+        while True:
+            item = await out_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Raised):
+                raise item.exc
+            i, y = item
+            if window is None:
+                yield y
+                continue
+            pending[i] = y
+            while next_index in pending:
+                y = pending.pop(next_index)
+                next_index += 1
+                window.release()
+                yield y
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 if __name__ == "__main__":
     print(apply_pipeline([1, 2, 3], [lambda x: x * 2, lambda x: x + 1]))
+    print(list(iter_pipeline(range(3), [lambda x: x * 2, lambda x: x + 1])))
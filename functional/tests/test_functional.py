@@ -1,4 +1,27 @@
-from functional.main import apply_pipeline
+import asyncio
+import contextlib
+import itertools
+import json
+import pickle
+import time
+
+import pytest
+
+from functional import main
+from functional.main import (
+    PipelineReport,
+    _inline_expr,
+    _next_chunk_size,
+    apipeline,
+    apply_pipeline,
+    astage,
+    batched,
+    cache_stats,
+    cached,
+    compile_pipeline,
+    iter_pipeline,
+    vectorized,
+)
 
 
 def test_apply_pipeline_basic():
@@ -11,3 +34,479 @@ def test_apply_pipeline_empty_seq():
 
 def test_apply_pipeline_no_funcs():
     assert apply_pipeline([1, 2], []) == [1, 2]
+
+
+def test_iter_pipeline_matches_apply_pipeline():
+    funcs = [lambda x: x * 2, lambda x: x + 1]
+    it = iter_pipeline([1, 2, 3], funcs)
+    assert not isinstance(it, list)
+    assert list(it) == apply_pipeline([1, 2, 3], funcs)
+    assert list(iter_pipeline([1, 2], [])) == [1, 2]
+
+
+def test_iter_pipeline_is_lazy():
+    seen = []
+
+    def record(x):
+        seen.append(x)
+        return x
+
+    it = iter_pipeline(itertools.count(), [record, lambda x: x * x])
+    assert list(itertools.islice(it, 3)) == [0, 1, 4]
+    assert seen == [0, 1, 2]  # 只处理了被取走的元素
+
+
+def test_compile_pipeline_matches_stagewise_map():
+    scale = 3
+
+    def square(x):
+        return x * x
+
+    funcs = [lambda x: x * 2, square, lambda x: x + scale, abs, lambda x: x - 7]
+    expected = list(range(-5, 5))
+    for f in funcs:
+        expected = list(map(f, expected))
+    for codegen in (True, False):
+        fused = compile_pipeline(funcs, codegen=codegen)
+        assert list(map(fused, range(-5, 5))) == expected
+    assert compile_pipeline([])(42) == 42
+    assert compile_pipeline([abs]) is abs
+
+
+def test_apply_pipeline_codegen_is_opt_in_and_cached(monkeypatch):
+    inlined = []
+    real = main._inline_expr
+    monkeypatch.setattr(main, "_inline_expr", lambda f: inlined.append(f) or real(f))
+    funcs = [lambda x: x * 2, lambda x: x + 1]
+    data = list(range(main.FUSE_MIN_ITEMS))
+    expected = [x * 2 + 1 for x in data]
+    assert apply_pipeline(data, funcs) == expected
+    assert inlined == []  # 默认不读源码、不内联
+    assert apply_pipeline(data, funcs, codegen=True) == expected
+    assert len(inlined) == 2
+    assert compile_pipeline(funcs, codegen=True) is compile_pipeline(funcs, True)
+    assert list(iter_pipeline(data, funcs, codegen=True)) == expected
+    assert len(inlined) == 2  # 同一组函数只编译一次
+
+    # 短输入不融合，直接逐级 map
+    monkeypatch.setattr(main, "compile_pipeline", None)
+    assert apply_pipeline([1, 2, 3], [lambda x: x * 2, lambda x: x + 1]) == [3, 5, 7]
+
+
+def test_compile_pipeline_inlines_only_simple_lambdas():
+    k = 1
+    assert _inline_expr(lambda x: x * 2 + 1) == "(_v * 2 + 1)"
+    assert _inline_expr(lambda x: x + k) is None  # 闭包变量
+    assert _inline_expr(lambda x: len(x)) is None  # 全局名
+    assert _inline_expr(lambda x, y=1: x) is None
+    assert _inline_expr(abs) is None
+    # 同一行的多个 lambda 各自匹配到自己的源码
+    a, b = (lambda x: x - 1), (lambda y: y * 10)
+    assert (_inline_expr(a), _inline_expr(b)) == ("(_v - 1)", "(_v * 10)")
+    # 字节码相同、常量只差类型的 lambda 不会互相混淆，融合结果与逐级 map 一致
+    f, g = (lambda x: x // 2), (lambda x: x // 2.0)
+    assert (_inline_expr(f), _inline_expr(g)) == ("(_v // 2)", "(_v // 2.0)")
+    data = range(main.FUSE_MIN_ITEMS)
+    assert apply_pipeline(data, [abs, g], codegen=True)[:3] == [0.0, 0.0, 1.0]
+    assert apply_pipeline(data, [abs, f], codegen=True)[:3] == [0, 0, 1]
+
+
+def _square(x):
+    return x * x
+
+
+def _inc(x):
+    return x + 1
+
+
+def test_apply_pipeline_workers_keeps_order():
+    data = list(range(1000))
+    expected = [x * x + 1 for x in data]
+    # 模块级函数可 pickle，走进程池
+    assert main._picklable([_square, _inc])
+    assert apply_pipeline(iter(data), [_square, _inc], workers=2) == expected
+    # 简单 lambda 以表达式源码交给子进程，结果相同
+    assert not main._picklable([lambda x: x])
+    squared = apply_pipeline(data, [lambda x: x * x, lambda x: x + 1], workers=3)
+    assert squared == expected
+    assert apply_pipeline([], [_square], workers=2) == []
+    with pytest.raises(ValueError):
+        apply_pipeline(data, [_square], workers=0)
+
+
+def test_worker_payload_ships_lambdas_to_processes(monkeypatch):
+    k = 3
+    payload = main._worker_payload([_square, lambda x: x * 2, vectorized(lambda a: -a)])
+    assert isinstance(payload, list) and payload[0] is _square
+    restored = pickle.loads(pickle.dumps(payload))
+    assert [f(4) for f in restored[:2]] == [16, 8]
+    assert restored[2].func(5) == -5
+    assert main.compile_pipeline(restored[:2])(4) == 32
+
+    closure = [lambda x: x + k]
+    if main.cloudpickle is not None:
+        assert isinstance(main._worker_payload(closure), bytes)
+        assert apply_pipeline(range(5), closure, workers=2) == [3, 4, 5, 6, 7]
+    # 既不能内联也没有 cloudpickle 时退回线程池，结果不变
+    monkeypatch.setattr(main, "cloudpickle", None)
+    assert main._worker_payload(closure) is None
+    assert apply_pipeline(range(5), closure, workers=2) == [3, 4, 5, 6, 7]
+
+
+def test_worker_payload_keeps_lambdas_on_one_line_apart():
+    f, g = (lambda x: x // 2), (lambda x: x // 2.0)
+    exprs = [stage.expr for stage in main._worker_payload([f, g])]
+    assert exprs == ["(_v // 2)", "(_v // 2.0)"]
+    assert apply_pipeline(range(5), [g], workers=2) == [0.0, 0.0, 1.0, 1.0, 2.0]
+    assert apply_pipeline(range(5), [f], workers=2) == [0, 0, 1, 1, 2]
+
+
+def test_apply_pipeline_workers_propagates_errors():
+    with pytest.raises(ZeroDivisionError):
+        apply_pipeline([1, 0, 2], [lambda x: 1 / x], workers=2)
+
+
+def test_next_chunk_size_targets_chunk_duration():
+    fast = _next_chunk_size(16, 16, 1e-6)
+    assert fast == 64  # 每次最多放大 4 倍
+    assert _next_chunk_size(1024, 1024, main.TARGET_CHUNK_SECONDS) == 1024
+    assert _next_chunk_size(1024, 1024, 100.0) == 256
+    assert _next_chunk_size(16, 16, 100.0) == main.MIN_CHUNK_SIZE
+    assert _next_chunk_size(main.MAX_CHUNK_SIZE, 10, 0.0) == main.MAX_CHUNK_SIZE
+
+
+def test_vectorized_stages_match_scalar_pipeline():
+    np = pytest.importorskip("numpy")
+    scalar = [lambda x: x * 2, lambda x: x + 1, lambda x: -x, str]
+    mixed = [vectorized(lambda a: a * 2), lambda x: x + 1, np.negative, str]
+    data = list(range(100))
+    expected = apply_pipeline(data, scalar)
+    assert apply_pipeline(data, mixed, block_size=7) == expected
+    assert apply_pipeline(np.arange(100), mixed, block_size=7) == expected
+    assert list(iter_pipeline(iter(data), mixed, block_size=7)) == expected
+    roots = apply_pipeline(data, [np.sqrt, np.floor])
+    assert roots == [float(int(x**0.5)) for x in data]
+    negated = apply_pipeline(data, [_square, np.negative], workers=2)
+    assert negated == [-x * x for x in data]
+    assert apply_pipeline([], mixed) == []
+    with pytest.raises(ValueError):
+        apply_pipeline(data, [vectorized(np.sum)])  # 归约成标量
+    with pytest.raises(ValueError):
+        apply_pipeline(data, mixed, block_size=0)
+
+
+def test_ufunc_falls_back_to_elementwise_on_non_1d_blocks():
+    np = pytest.importorskip("numpy")
+    # 长度不一的元素与二维元素：与逐元素调用 ufunc 的结果一致（每个元素得到数组）
+    for data in ([[1], [2, 3]], [[1, 2], [3, 4]], np.array([[1, 2], [3, 4]])):
+        expected = [np.negative(x) for x in data]
+        for report in (None, PipelineReport()):
+            out = apply_pipeline(data, [np.negative, np.abs], report=report)
+            assert all(isinstance(y, np.ndarray) for y in out)
+            assert [y.tolist() for y in out] == [np.abs(y).tolist() for y in expected]
+    assert apply_pipeline([1, 2], [np.negative]) == [-1, -2]  # 一维仍按整块执行
+    # 显式 vectorized 的阶段不退回，照常报错
+    with pytest.raises(ValueError):
+        apply_pipeline([[1], [2, 3]], [vectorized(np.negative)])
+
+
+def test_vectorized_without_numpy_gets_lists(monkeypatch):
+    monkeypatch.setattr(main, "np", None)
+    blocks = []
+
+    @vectorized
+    def double_all(block):
+        blocks.append(type(block))
+        return [x * 2 for x in block]
+
+    assert apply_pipeline(range(5), [double_all, _inc], block_size=2) == [1, 3, 5, 7, 9]
+    assert blocks == [list, list, list]
+
+    # 数组写法在 list 上会改变元素个数：报错而不是静默返回错误结果
+    repeat = [vectorized(lambda a: a * 2), lambda x: x + 1]
+    with pytest.raises(ValueError):
+        apply_pipeline([1, 2, 3], repeat)
+    with pytest.raises(ValueError):
+        list(iter_pipeline(iter([1, 2, 3]), repeat))
+
+
+def test_cached_stage_in_list_and_stream_forms():
+    calls = []
+
+    @cached(maxsize=2)
+    def parse(s):
+        calls.append(s)
+        return int(s)
+
+    funcs = [parse, _inc]
+    data = ["1", "2", "1", "1", "3", "1"]
+    assert apply_pipeline(data, funcs) == [2, 3, 2, 2, 4, 2]
+    assert list(iter_pipeline(iter(data), funcs)) == [2, 3, 2, 2, 4, 2]
+    stats = cache_stats(funcs)["0:parse"]
+    # 第一次：1 2 未命中，1 1 命中，3 未命中并淘汰 2，1 命中；
+    # 第二次 2、3 又各被淘汰一次，其余命中
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (7, 5, 3)
+    assert stats["hit_rate"] == 7 / 12 and stats["saved_seconds"] >= 0
+    assert calls == ["1", "2", "3", "2", "3"]
+    # 键区分类型：1、True、1.0 相等且哈希相同，但结果不能互相复用
+    typed = apply_pipeline([1, True, 1.0, 1], [cached(repr)])
+    assert typed == ["1", "True", "1.0", "1"]
+    # 不可哈希的参数直接调用原函数，不计入统计
+    assert cached(len)([1, 2]) == 2
+
+
+def test_cached_stage_ttl_and_clear():
+    now = [0.0]
+    stage = main.CachedStage(
+        lambda x: object(), maxsize=8, ttl=10, clock=lambda: now[0]
+    )
+    first = stage("k")
+    assert stage("k") is first
+    now[0] = 10.0
+    assert stage("k") is not first  # 过期后重新计算
+    assert stage.stats()["expirations"] == 1
+    stage.clear()
+    assert stage.stats()["size"] == 0 and stage.stats()["hits"] == 0
+    with pytest.raises(ValueError):
+        cached(abs, maxsize=0)
+
+
+def test_pipeline_report_per_stage_stats():
+    def slow(x):
+        time.sleep(0.002)
+        return x
+
+    report = PipelineReport()
+    funcs = [_square, slow, cached(str)]
+    out = apply_pipeline(range(20), funcs, report=report)
+    assert out == [str(x * x) for x in range(20)]
+    data = json.loads(report.to_json())
+    assert data["items"] == 20 and data["wall_seconds"] > 0
+    names = [st["name"] for st in data["stages"]]
+    assert names == ["0:_square", "1:slow", "2:str"]
+    square, sleep, to_str = data["stages"]
+    assert square["calls"] == sleep["calls"] == to_str["calls"] == 20
+    assert sleep["p50_seconds"] >= 0.002
+    assert sleep["p99_seconds"] >= sleep["p50_seconds"]
+    assert sleep["total_seconds"] > square["total_seconds"]
+    assert "1:slow" in str(report)
+
+
+def test_pipeline_report_stream_workers_and_vector():
+    report = PipelineReport()
+    it = iter_pipeline(range(5), [_inc], report=report)
+    assert report.items == 0
+    assert list(it) == [1, 2, 3, 4, 5]
+    assert report.items == 5 and report.stages[0].calls == 5
+
+    # 计时包装不可 pickle，workers= 退回线程池，统计仍汇总在同一个报告里
+    out = apply_pipeline(range(100), [_inc], workers=2, report=report)
+    assert out == list(range(1, 101))
+    assert report.stages[0].calls == 100
+
+    np = pytest.importorskip("numpy")
+    apply_pipeline(range(10), [np.negative, _inc], block_size=4, report=report)
+    vec, scalar = report.stages
+    assert (vec.calls, vec.items) == (3, 10)
+    assert (scalar.calls, scalar.items) == (10, 10)
+
+
+def test_apipeline_concurrency_limit_and_order():
+    running = peak = 0
+
+    async def fetch(x):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001 * (x % 4))
+        running -= 1
+        return x
+
+    async def collect(ordered):
+        stages = [_inc, astage(fetch, concurrency=3, queue_size=2), str]
+        return [y async for y in apipeline(range(40), stages, ordered=ordered)]
+
+    expected = [str(x + 1) for x in range(40)]
+    assert asyncio.run(collect(True)) == expected
+    assert peak == 3
+    unordered = asyncio.run(collect(False))
+    assert sorted(unordered, key=int) == expected and unordered != expected
+
+
+def test_apipeline_ordered_window_ignores_size_attribute():
+    read = 0
+
+    def source():
+        nonlocal read
+        for i in itertools.count():
+            read += 1
+            yield i
+
+    class Slow:
+        size = 10**6  # 普通可调用对象上的 size 属性不是批大小
+
+        async def __call__(self, x):
+            await asyncio.sleep(0.05 if x == 0 else 0)
+            return x
+
+    async def first():
+        stages = [astage(Slow(), concurrency=2)]
+        agen = apipeline(source(), stages, ordered=True, queue_size=1)
+        y = await agen.__anext__()
+        await agen.aclose()
+        return y
+
+    assert asyncio.run(first()) == 0
+    assert read <= 2 + 2 + 1  # 读取窗口 = 两个队列容量 + 并发数，与 size 无关
+
+
+def test_apipeline_async_source_threads_errors_and_cancel():
+    async def source():
+        for i in range(5):
+            await asyncio.sleep(0)
+            yield i
+
+    async def run(stages, src, limit=None):
+        out = []
+        pipe = apipeline(src, stages, ordered=True, queue_size=1)
+        async with contextlib.aclosing(pipe):
+            async for y in pipe:
+                out.append(y)
+                if limit and len(out) == limit:
+                    break
+        return out, [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    def blocking_io(x):
+        time.sleep(0.001)
+        return x * 2
+
+    blocking = astage(blocking_io, concurrency=2, threaded=True)
+    assert asyncio.run(run([blocking], source())) == ([0, 2, 4, 6, 8], [])
+    assert asyncio.run(run([], range(3))) == ([0, 1, 2], [])
+    # 提前停止：所有 worker 被取消
+    assert asyncio.run(run([_inc], itertools.count(), limit=3)) == ([1, 2, 3], [])
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(run([lambda x: 1 / (x - 2)], range(5)))
+    with pytest.raises(ValueError):
+        astage(abs, concurrency=0)
+
+
+def _batch_sizes(batch):
+    return [len(batch)] * len(batch)
+
+
+def _bulk_double(batch):
+    return [x * 2 for x in batch]
+
+
+def test_batched_stage_groups_and_splits():
+    sizes = []
+
+    @batched(size=4)
+    def bulk(batch):
+        sizes.append(len(batch))
+        return [x * 10 for x in batch]
+
+    funcs = [_inc, bulk, str]
+    expected = [str((x + 1) * 10) for x in range(10)]
+    assert apply_pipeline(range(10), funcs) == expected
+    assert sizes == [4, 4, 2]
+    assert apply_pipeline(range(10), funcs, block_size=3) == expected
+    assert sizes[3:] == [4, 4, 2]  # 剩余元素跨块保留，批大小不受分块影响
+    assert list(iter_pipeline(iter(range(10)), funcs)) == expected
+    doubled = apply_pipeline(range(50), [batched(_bulk_double, size=8)], workers=2)
+    assert doubled == [x * 2 for x in range(50)]
+    with pytest.raises(ValueError):
+        apply_pipeline(range(3), [batched(lambda b: b[:1])])
+    with pytest.raises(ValueError):
+        batched(abs, size=0)
+
+
+def test_batched_stages_keep_their_own_sizes():
+    calls = {"a": [], "b": []}
+
+    def recorder(name):
+        def bulk(batch):
+            calls[name].append(len(batch))
+            return batch
+
+        return bulk
+
+    funcs = [batched(recorder("a"), size=100), batched(recorder("b"), size=10)]
+    assert list(iter_pipeline(iter(range(250)), funcs)) == list(range(250))
+    assert calls == {"a": [100, 100, 50], "b": [10] * 25}
+
+    calls["a"].clear()
+    assert apply_pipeline(range(250), funcs[:1], block_size=64) == list(range(250))
+    assert calls["a"] == [100, 100, 50]
+
+    # workers=：分片大小取整为批大小的倍数，进程内每批都是完整的
+    out = apply_pipeline(range(1000), [batched(_batch_sizes, size=48)], workers=2)
+    rest = 1000 % 48
+    assert set(out[:-rest]) == {48} and set(out[-rest:]) == {rest}
+    # 多个批大小：分片按最大的 size 取整并受 MAX_CHUNK_SIZE 限制，而不是最小公倍数
+    assert main._chunk_length(16, 1000) == 1000
+    assert main._chunk_length(main.MAX_CHUNK_SIZE, 999) <= main.MAX_CHUNK_SIZE
+    assert main._chunk_length(16, main.MAX_CHUNK_SIZE * 2) == main.MAX_CHUNK_SIZE * 2
+    funcs = [batched(_batch_sizes, size=10), batched(_bulk_double, size=7)]
+    out = apply_pipeline(range(100), funcs, workers=2)
+    assert out == [20] * 100
+
+
+def test_batched_max_wait_in_stream():
+    sizes = []
+
+    def slow_source():
+        for i in range(6):
+            if i == 3:
+                time.sleep(0.05)
+            yield i
+
+    def bulk(batch):
+        sizes.append(len(batch))
+        return batch
+
+    stage = batched(bulk, size=100, max_wait=0.02)
+    assert list(iter_pipeline(slow_source(), [stage])) == list(range(6))
+    # 第 4 个元素到达时前一批已等待超过 max_wait，连同它一起交出
+    assert sizes == [4, 2]
+
+
+def test_apipeline_batched_uses_real_timeout():
+    sizes = []
+
+    async def bulk_insert(batch):
+        sizes.append(len(batch))
+        await asyncio.sleep(0)
+        return [f"id{x}" for x in batch]
+
+    async def source():
+        for i in range(5):
+            if i == 3:
+                await asyncio.sleep(0.1)
+            yield i
+
+    async def run(ordered):
+        sizes.clear()
+        stage = batched(bulk_insert, size=10, max_wait=0.02)
+        return [y async for y in apipeline(source(), [stage], ordered=ordered)]
+
+    assert asyncio.run(run(False)) == [f"id{i}" for i in range(5)]
+    assert sizes == [3, 2]  # 超时后不等第 4 个元素
+    big = astage(batched(_bulk_double, size=1000), concurrency=2)
+
+    async def ordered_run():
+        pipe = apipeline(range(300), [big], ordered=True, queue_size=4)
+        return [y async for y in pipe]
+
+    assert asyncio.run(ordered_run()) == [x * 2 for x in range(300)]
+
+    # 保序且无 max_wait：读取窗口耗尽时交出不足一批的元素而不是死锁
+    async def starved():
+        q = asyncio.Queue()
+        q.put_nowait((0, "a"))
+        q.put_nowait((1, "b"))
+        window = asyncio.Semaphore(0)
+        return await main._collect_batch(q, batched(list, size=10), window)
+
+    assert asyncio.run(starved()) == ([(0, "a"), (1, "b")], False)
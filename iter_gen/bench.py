@@ -0,0 +1,107 @@
+"""iter_gen 基准。
+
+运行（在仓库根目录）：
+    python -m iter_gen.bench
+    python -m iter_gen.bench --n 100000000 --block-size 1048576
+    python -m iter_gen.bench --overlap-n 2000 --delay 0.0005
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from iter_gen.main import INT64_MAX, np, prefetch, squares, squares_blocks
+
+
+def _timeit(func: Callable[[], object]) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _block_sum(block) -> int:
+    # 块内总和可能超过 int64 时改用 object 累加器，保证结果精确。
+    if block.dtype == object or int(block[-1]) * len(block) > INT64_MAX:
+        return int(block.sum(dtype=object))
+    return int(block.sum())
+
+
+def bench_sum_squares(n: int, block_size: int) -> dict[str, float]:
+    """对 0..n-1 的平方求和：逐元素生成器 vs 分块（array('q') / NumPy）。"""
+    expected = (n - 1) * n * (2 * n - 1) // 6
+    runs = {
+        "squares": lambda: sum(squares(n)),
+        "squares_blocks[array]": lambda: sum(
+            sum(b) for b in squares_blocks(n, block_size, use_numpy=False)
+        ),
+    }
+    if np is not None:
+        runs["squares_blocks[numpy]"] = lambda: sum(
+            _block_sum(b) for b in squares_blocks(n, block_size, True)
+        )
+    results = {}
+    for name, run in runs.items():
+        seconds, total = _timeit(run)
+        assert total == expected, f"{name} 求和结果错误"
+        results[name] = seconds
+    return results
+
+
+def _slow_squares(n: int, delay: float):
+    """模拟 I/O 型生产者：每产出一个平方前等待 `delay` 秒。"""
+    for x in squares(n):
+        time.sleep(delay)
+        yield x
+
+
+def _slow_consume(items, delay: float) -> int:
+    """模拟慢消费者：每个元素处理 `delay` 秒。
+
+    sleep 会释放 GIL，代表 I/O 或原生计算。
+    """
+    total = 0
+    for x in items:
+        time.sleep(delay)
+        total += x
+    return total
+
+
+def bench_prefetch_overlap(
+    n: int, delay: float, depth: int = 8, batch: int = 16
+) -> dict[str, float]:
+    """生产与消费各耗时约 n * delay 秒：串行约 2 * n * delay，预取后接近 n * delay。"""
+    results = {}
+    seconds, total = _timeit(lambda: _slow_consume(_slow_squares(n, delay), delay))
+    results["serial"] = seconds
+    expected = total
+    seconds, total = _timeit(
+        lambda: _slow_consume(prefetch(_slow_squares(n, delay), depth, batch), delay)
+    )
+    assert total == expected, "prefetch 结果错误"
+    results["prefetch"] = seconds
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="iter_gen benchmark")
+    parser.add_argument("--n", type=int, default=10_000_000)
+    parser.add_argument("--block-size", type=int, default=65536)
+    parser.add_argument("--overlap-n", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    results = bench_sum_squares(args.n, args.block_size)
+    base = results["squares"]
+    print(f"== sum of squares, n={args.n:,}, block_size={args.block_size:,} ==")
+    for name, seconds in results.items():
+        print(f"{name:>22}: {seconds * 1e3:9.1f} ms  x{base / seconds:.2f}")
+
+    results = bench_prefetch_overlap(args.overlap_n, args.delay)
+    base = results["serial"]
+    print(f"== 慢生产者 + 慢消费者, n={args.overlap_n:,}, delay={args.delay}s ==")
+    for name, seconds in results.items():
+        print(f"{name:>22}: {seconds * 1e3:9.1f} ms  x{base / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
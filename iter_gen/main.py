@@ -1,8 +1,318 @@
+import asyncio
+import queue
+import threading
+from array import array
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from math import isqrt
+from operator import mul
+
+try:  # NumPy 为可选依赖：没有安装时 squares_blocks 产出 array('q')
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
+
+# int64 能表示的最大值；i * i 超过它的块改用 Python int 表示。
+INT64_MAX = 2**63 - 1
+
+
 def squares(n: int):
     """生成 0..n-1 的平方序列"""
     for i in range(max(0, n)):
         yield i * i
 
 
+def squares_blocks(n: int, block_size: int = 65536, use_numpy: bool | None = None):
+    """按块生成 0..n-1 的平方，每块一次性向量化计算，避免逐元素的生成器开销。
+
+    - 有 NumPy 时每块是 int64 的 ndarray，否则是 `array('q')`；
+      `use_numpy` 可强制选择（None 表示自动）。
+    - 块内最大的平方超过 int64 时整块提升为 Python int：NumPy 下为 dtype=object
+      的数组，否则为 list[int]，结果始终精确、不会溢出回绕。
+    - 拼接所有块等于 `list(squares(n))`；n <= 0 时不产出任何块。
+
+    示例：
+    >>> [list(b) for b in squares_blocks(5, block_size=2, use_numpy=False)]
+    [[0, 1], [4, 9], [16]]
+    """
+    if block_size <= 0:
+        raise ValueError("block_size 必须为正整数")
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise ValueError("use_numpy=True 需要安装 NumPy")
+
+    for start in range(0, max(0, n), block_size):
+        end = min(n, start + block_size)
+        fits = (end - 1) * (end - 1) <= INT64_MAX
+        if use_numpy:
+            block = np.arange(start, end, dtype=np.int64 if fits else object)
+            yield block * block
+        else:
+            r = range(start, end)
+            yield array("q", map(mul, r, r)) if fits else list(map(mul, r, r))
+
+
+class Squares(Sequence):
+    """惰性的平方序列视图，类似 `range`：不生成元素，内存占用与 n 无关。
+
+    `Squares(n)` 表示 0, 1, 4, ..., (n-1)**2；也可以传入一个非负整数的 `range`，
+    表示对其中每个数取平方。
+
+    支持：
+    - `len`、下标（含负下标）、切片（返回新的 `Squares` 视图，底层只是切片后的 range）；
+    - `in` / `index` / `count`：用整数平方根 `math.isqrt` 反推底数，O(1)；
+    - `.sum()`：等差数列平方和的闭式公式，O(1)（内置 `sum()` 仍会逐个迭代）。
+
+    示例：
+    >>> sq = Squares(10)
+    >>> len(sq), sq[-1], list(sq[2:8:3]), 49 in sq, sq.sum()
+    (10, 81, [4, 25], True, 285)
+    """
+
+    def __init__(self, n: "int | range"):
+        if isinstance(n, range):
+            if len(n) and min(n[0], n[-1]) < 0:
+                raise ValueError("Squares 只接受非负整数构成的 range")
+            self._range = n
+        else:
+            self._range = range(max(0, n))
+
+    def __len__(self) -> int:
+        return len(self._range)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Squares(self._range[index])
+        i = self._range[index]
+        return i * i
+
+    def __iter__(self) -> Iterator[int]:
+        r = self._range
+        return map(mul, r, r)
+
+    def __reversed__(self) -> Iterator[int]:
+        r = self._range[::-1]
+        return map(mul, r, r)
+
+    def _root(self, value) -> int | None:
+        """value 为完全平方数且底数在序列中时返回底数，否则返回 None。"""
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, int) or value < 0:
+            return None
+        root = isqrt(value)
+        if root * root == value and root in self._range:
+            return root
+        return None
+
+    def __contains__(self, value) -> bool:
+        return self._root(value) is not None
+
+    def index(self, value, start: int = 0, stop: int | None = None) -> int:
+        # 负的 start/stop 与 list.index 一样从末尾倒数，再截到 0。
+        if start < 0:
+            start = max(len(self) + start, 0)
+        if stop is None:
+            stop = len(self)
+        elif stop < 0:
+            stop = max(len(self) + stop, 0)
+        root = self._root(value)
+        if root is not None:
+            i = self._range.index(root)
+            if start <= i < stop:
+                return i
+        raise ValueError(f"{value!r} 不在 Squares 中")
+
+    def count(self, value) -> int:
+        # 底数互不相同且都非负，所以每个平方至多出现一次。
+        return 1 if value in self else 0
+
+    def sum(self) -> int:
+        """闭式求和：对 a, a+d, ..., a+(n-1)d 有
+        Σ(a+kd)² = n·a² + 2ad·n(n-1)/2 + d²·(n-1)n(2n-1)/6。"""
+        n = len(self._range)
+        if n == 0:
+            return 0
+        a, d = self._range.start, self._range.step
+        return n * a * a + a * d * n * (n - 1) + d * d * (n - 1) * n * (2 * n - 1) // 6
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Squares):
+            return self._range == other._range
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((Squares, self._range))
+
+    def __repr__(self) -> str:
+        r = self._range
+        if r.start == 0 and r.step == 1:
+            return f"Squares({r.stop})"
+        return f"Squares({r!r})"
+
+
+class _Raised:
+    """生产者线程抛出的异常，随队列交给消费者重新抛出。"""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_DONE = object()
+
+
+def _produce_batches(
+    gen: Iterable, batch: int, put: Callable[[object], bool], stop: threading.Event
+) -> None:
+    """生产者线程主体：把 gen 的元素按 `batch` 个一组交给 `put`，结束时放入 _DONE，
+    出错时放入 _Raised。`put` 返回 False 或 `stop` 被设置表示消费者已取消，
+    此时提前退出并关闭源迭代器。"""
+    it = iter(gen)
+    try:
+        buf = []
+        for item in it:
+            if stop.is_set():
+                return
+            buf.append(item)
+            if len(buf) >= batch:
+                if not put(buf):
+                    return
+                buf = []
+        if buf and not put(buf):
+            return
+        put(_DONE)
+    except BaseException as exc:
+        put(_Raised(exc))
+    finally:
+        if stop.is_set() and hasattr(it, "close"):
+            it.close()
+
+
+def prefetch(gen: Iterable, depth: int = 4, batch: int = 64):
+    """在后台线程中提前运行生产者，让 I/O 型生产与 CPU 型消费重叠进行。
+
+    - 生产者把元素攒成最多 `batch` 个一组放进容量为 `depth` 的有界队列，
+      每组只需一次加锁，队列满时生产者阻塞，内存占用至多 depth * batch 个元素；
+    - 生产者中的异常会在消费端原样抛出（保留原始 traceback）；
+    - 消费端提前退出（break、close() 或被垃圾回收）时通知生产者停止，
+      生产者在下一个元素处退出并关闭源迭代器。
+
+    生成器在第一次 next() 时才启动后台线程。
+
+    示例：
+    >>> list(prefetch(squares(5), depth=2, batch=2))
+    [0, 1, 4, 9, 16]
+    """
+    if depth <= 0 or batch <= 0:
+        raise ValueError("depth 与 batch 必须为正整数")
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # 带超时地重试，消费者取消后不会永久阻塞在满队列上。
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    worker = threading.Thread(
+        target=_produce_batches,
+        args=(gen, batch, put, stop),
+        name="prefetch",
+        daemon=True,
+    )
+    worker.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield from item
+    finally:
+        stop.set()
+
+
+async def asquares(n: int, yield_every: int = 1024) -> AsyncIterator[int]:
+    """`squares` 的异步生成器版本：每产出 `yield_every` 个元素让出一次事件循环，
+    即使消费者一直不 await 别的东西，其他协程也能及时得到调度。"""
+    if yield_every <= 0:
+        raise ValueError("yield_every 必须为正整数")
+    for i in range(max(0, n)):
+        yield i * i
+        if i % yield_every == yield_every - 1:
+            await asyncio.sleep(0)
+
+
+async def asquares_blocks(
+    n: int, block_size: int = 65536, use_numpy: bool | None = None
+) -> AsyncIterator:
+    """`squares_blocks` 的异步生成器版本：每块之间让出一次事件循环。"""
+    for block in squares_blocks(n, block_size, use_numpy):
+        yield block
+        await asyncio.sleep(0)
+
+
+async def to_async(
+    gen: Iterable,
+    depth: int = 4,
+    batch: int = 64,
+    executor: Executor | None = None,
+) -> AsyncIterator:
+    """把同步生成器转成异步生成器：生产者在线程池（默认执行器或传入的 executor）
+    中运行，事件循环不会被它的阻塞 I/O 或计算卡住。
+
+    背压：生产者把元素攒成最多 `batch` 个一组放进容量为 `depth` 的 asyncio.Queue，
+    队列满时生产者线程阻塞等待，因此缓冲的元素至多约 depth * batch 个，
+    快生产者不会让内存无限增长。异常与取消的处理方式与 `prefetch` 相同。
+    """
+    if depth <= 0 or batch <= 0:
+        raise ValueError("depth 与 batch 必须为正整数")
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # 在生产者线程里等待事件循环中的 q.put 完成，队列满时即在此阻塞。
+        fut = asyncio.run_coroutine_threadsafe(q.put(item), loop)
+        while not stop.is_set():
+            try:
+                fut.result(timeout=0.05)
+                return True
+            except TimeoutError:
+                pass
+        fut.cancel()
+        return False
+
+    producer = loop.run_in_executor(
+        executor, _produce_batches, gen, batch, put, stop
+    )
+    try:
+        while True:
+            item = await q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Raised):
+                raise item.exc
+            for x in item:
+                yield x
+    finally:
+        stop.set()
+    await producer
+
+
 if __name__ == "__main__":
     print(list(squares(5)))
+    print([[int(x) for x in b] for b in squares_blocks(5, block_size=2)])
+    print(Squares(10)[::3], list(Squares(10)[::3]), Squares(10).sum())
+    print(list(prefetch(squares(5), depth=2, batch=2)))
+
+    async def _demo() -> list[int]:
+        return [x async for x in to_async(squares(5), depth=2, batch=2)]
+
+    print(asyncio.run(_demo()))
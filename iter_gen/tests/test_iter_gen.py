@@ -1,4 +1,20 @@
-from iter_gen.main import squares
+import asyncio
+import threading
+import time
+from array import array
+
+import pytest
+
+import iter_gen.main
+from iter_gen.main import (
+    Squares,
+    asquares,
+    asquares_blocks,
+    prefetch,
+    squares,
+    squares_blocks,
+    to_async,
+)
 
 
 def test_squares_basic():
@@ -11,3 +27,211 @@ def test_squares_zero():
 
 def test_squares_negative():
     assert list(squares(-3)) == []
+
+
+def _flatten(blocks):
+    return [int(x) for b in blocks for x in b]
+
+
+def test_squares_blocks_matches_squares():
+    for use_numpy in (False, None):
+        for n in (0, 1, 5, 17):
+            blocks = squares_blocks(n, block_size=4, use_numpy=use_numpy)
+            assert _flatten(blocks) == list(squares(n))
+    assert list(squares_blocks(-3)) == []
+
+
+def test_squares_blocks_array_backend_and_promotion(monkeypatch):
+    blocks = list(squares_blocks(5, block_size=3, use_numpy=False))
+    assert all(isinstance(b, array) and b.typecode == "q" for b in blocks)
+    # 把上界调小来模拟溢出：超过上界的块提升为 Python int，结果仍然精确
+    monkeypatch.setattr(iter_gen.main, "INT64_MAX", 50)
+    blocks = list(squares_blocks(10, block_size=4, use_numpy=False))
+    assert [type(b) for b in blocks] == [array, array, list]
+    assert _flatten(blocks) == list(squares(10))
+
+
+def test_squares_blocks_numpy_overflow_promotion(monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(iter_gen.main, "INT64_MAX", 50)
+    blocks = list(squares_blocks(10, block_size=4, use_numpy=True))
+    assert [b.dtype for b in blocks] == [np.int64, np.int64, object]
+    assert _flatten(blocks) == list(squares(10))
+    # 真实的 int64 边界：3037000500 ** 2 超过 2**63 - 1
+    monkeypatch.undo()
+    big = 3_037_000_500
+    assert (big - 1) ** 2 <= iter_gen.main.INT64_MAX < big**2
+
+
+def test_squares_blocks_invalid_block_size():
+    with pytest.raises(ValueError):
+        list(squares_blocks(5, block_size=0))
+
+
+def test_squares_view_matches_list():
+    sq = Squares(20)
+    ref = list(squares(20))
+    assert len(sq) == 20
+    assert list(sq) == ref
+    assert list(reversed(sq)) == ref[::-1]
+    for i in range(-20, 20):
+        assert sq[i] == ref[i]
+    for s in (slice(2, 15, 3), slice(None, None, -2), slice(-5, None), slice(8, 2)):
+        view = sq[s]
+        assert isinstance(view, Squares)
+        assert list(view) == ref[s]
+        assert view.sum() == sum(ref[s])
+    with pytest.raises(IndexError):
+        sq[20]
+
+
+def test_squares_view_membership_and_sum():
+    sq = Squares(10)[1::2]  # 1, 9, 25, 49, 81
+    assert 49 in sq and 49.0 in sq
+    assert 4 not in sq and 50 not in sq and -1 not in sq and "9" not in sq
+    assert sq.index(25) == 2
+    assert sq.count(81) == 1 and sq.count(4) == 0
+    with pytest.raises(ValueError):
+        sq.index(4)
+    # 负的 start/stop 与 list.index 一致：从末尾倒数
+    full, ref = Squares(10), [i * i for i in range(10)]
+    assert full.index(81, -5) == ref.index(81, -5) == 9
+    assert full.index(0, -20, -9) == 0
+    assert full.index(16, 0, -5) == ref.index(16, 0, -5) == 4
+    for start, stop in ((-5, None), (1, -5), (-3, -1)):
+        with pytest.raises(ValueError):
+            ref.index(0, start, *([stop] if stop is not None else []))
+        with pytest.raises(ValueError):
+            full.index(0, start, stop)
+    n = 10**18
+    assert Squares(n).sum() == (n - 1) * n * (2 * n - 1) // 6
+    assert Squares(-3).sum() == 0 and len(Squares(-3)) == 0
+
+
+def test_prefetch_preserves_order_across_batches():
+    for depth, batch in ((1, 1), (2, 3), (8, 64)):
+        assert list(prefetch(squares(100), depth=depth, batch=batch)) == list(
+            squares(100)
+        )
+    assert list(prefetch(iter([]))) == []
+
+
+def test_prefetch_propagates_producer_exception():
+    def broken():
+        yield 1
+        yield 2
+        raise RuntimeError("boom")
+
+    out = []
+    with pytest.raises(RuntimeError, match="boom"):
+        for x in prefetch(broken(), batch=1):
+            out.append(x)
+    assert out == [1, 2]
+
+
+def test_prefetch_cancellation_closes_source():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    it = prefetch(endless(), depth=2, batch=4)
+    assert [next(it) for _ in range(10)] == list(range(10))
+    it.close()
+    assert closed.wait(timeout=2)
+
+
+async def _max_tick_gap(consume) -> tuple[object, float]:
+    """在消费的同时运行一个 1ms 周期的计时协程，返回 (消费结果, 最大调度间隔秒数)。"""
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    result = await consume()
+    done.set()
+    await task
+    return result, max(gaps)
+
+
+def test_async_primitives_match_sync():
+    async def collect():
+        a = [x async for x in asquares(10, yield_every=3)]
+        b = [int(x) for blk in [b async for b in asquares_blocks(10, 4)] for x in blk]
+        c = [x async for x in to_async(squares(10), depth=1, batch=3)]
+        return a, b, c
+
+    a, b, c = asyncio.run(collect())
+    assert a == b == c == list(squares(10))
+
+
+def test_to_async_keeps_loop_responsive():
+    def slow_source():
+        for i in range(100):
+            time.sleep(0.002)  # 阻塞 I/O，直接在协程里迭代会卡住事件循环约 0.2s
+            yield i
+
+    async def consume():
+        return [x async for x in to_async(slow_source(), batch=8)]
+
+    result, gap = asyncio.run(_max_tick_gap(consume))
+    assert result == list(range(100))
+    assert gap < 0.05
+
+
+def test_asquares_yields_to_loop():
+    async def consume():
+        total = 0
+        async for x in asquares(1_000_000, yield_every=1000):
+            total += x
+        return total
+
+    # 同步迭代 1e6 个元素会独占事件循环约 0.1s 以上
+    result, gap = asyncio.run(_max_tick_gap(consume))
+    assert result == sum(squares(1_000_000))
+    assert gap < 0.05
+
+
+def test_to_async_backpressure_and_errors():
+    produced = 0
+
+    def fast_source():
+        nonlocal produced
+        for i in range(10_000):
+            produced += 1
+            yield i
+
+    async def consume_some():
+        agen = to_async(fast_source(), depth=2, batch=10)
+        seen = [await agen.__anext__() for _ in range(5)]
+        await asyncio.sleep(0.05)  # 让生产者尽量往前跑
+        await agen.aclose()
+        return seen
+
+    assert asyncio.run(consume_some()) == list(range(5))
+    # 队列 2 组 + 已取出的 1 组 + 正在攒的 1 组
+    assert produced <= 4 * 10 + 1
+
+    def broken():
+        yield 1
+        raise RuntimeError("boom")
+
+    async def consume_broken():
+        return [x async for x in to_async(broken(), batch=1)]
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(consume_broken())